@@ -0,0 +1,247 @@
+"""
+Run many simulated games in parallel.
+
+Every game runs the Simulation without a window in a worker process,
+with its own seed, level settings and a scripted seesaw controller.
+Results stream back as one JSON line per game, in the order the games
+were started, so tens of thousands of runs can be used to tune the
+difficulty.
+
+Run 1000 games on all cores with: python my_batch.py --games 1000
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from my_scores import high_scores
+from my_simulation import (
+    Simulation,
+    BALLOON_ROWS,
+    BALLOON_COLS,
+    BALLOON_SPEED,
+    PLAYER_SPEED_X,
+    PLAYER_LIVES,
+    ACROBAT_GRAVITY,
+)
+
+# Longest game in ticks, 5 minutes at 60 ticks per second
+MAX_TICKS = 5 * 60 * 60
+
+# Where the controller lands acrobats, as a fraction of the seesaw's width
+# from its center, drawn anew for every fall. Near the end of the lowered
+# side the catapulted acrobat flies high enough to reach the lowest balloon
+# row; a quarter does not. Always landing at the same offset repeats the
+# same flight path, which can miss the last balloons forever.
+LANDING_OFFSET = (0.35, 0.47)
+
+# Most ticks the controller waits before following a new fall
+REACTION_TICKS = 6
+
+# Ticks without a popped balloon before a game is given up, 1 minute
+STALL_TICKS = 60 * 60
+
+
+class GameResult(NamedTuple):
+    seed: int
+    balloon_rows: int
+    balloon_cols: int
+    balloon_speed: float
+    player_speed_x: float
+    gravity: float
+    score: int
+    lives_lost: int
+    ticks: int
+    balloons_popped: int
+    # True if the game was given up after STALL_TICKS without a popped balloon
+    stalled: bool
+
+
+class SeesawController:
+    """
+    Moves the seesaw under the lowest falling acrobat,
+    so the acrobat lands on the lowered side.
+    """
+
+    def __init__(self, seed=None):
+        """
+        The seed decides the landing offsets and reaction times, so games
+        with different seeds play out differently
+        """
+        self.rng = random.Random(seed)
+        self.offset = sum(LANDING_OFFSET) / 2
+        self.wait = 0
+        self.was_falling = False
+
+    def __call__(self, sim):
+        """
+        Return the (left, right, flip) input for the next tick
+        """
+        player = sim.player_sprite
+        falling = [
+            a.position for a in sim.acrobats
+            if sim.physics_engine.get_physics_object(a).body.velocity.y < 0
+        ]
+        return self.steer(
+            player.center_x, player.width, player.left_side_down, falling, sim.player_speed_x
+        )
+
+    def steer(self, seesaw_x, seesaw_width, left_side_down, falling, speed):
+        """
+        Return the (left, right, flip) input for a seesaw at seesaw_x
+        moving speed per tick, with falling acrobats at (x, y) positions
+        """
+        was_falling, self.was_falling = self.was_falling, bool(falling)
+        if not falling:
+            return False, False, False
+
+        # A new fall: pick where to land it and how long to wait
+        if not was_falling:
+            self.offset = self.rng.uniform(*LANDING_OFFSET)
+            self.wait = self.rng.randint(0, REACTION_TICKS)
+        if self.wait:
+            self.wait -= 1
+            return False, False, False
+
+        # The acrobat that will land first
+        target_x, _ = min(falling, key=lambda position: position[1])
+
+        # Land near the end of the lowered side
+        offset = seesaw_width * self.offset
+        if left_side_down:
+            target_x += offset
+        else:
+            target_x -= offset
+
+        diff = target_x - seesaw_x
+        if abs(diff) < speed:
+            return False, False, False
+        return diff < 0, diff > 0, False
+
+
+def run_game(job):
+    """
+    Play one game with the scripted controller. Runs in a worker process.
+    """
+    seed, rows, cols, balloon_speed, player_speed_x, gravity, max_ticks = job
+
+    sim = Simulation(
+        seed=seed,
+        balloon_rows=rows,
+        balloon_cols=cols,
+        balloon_speed=balloon_speed,
+        player_speed_x=player_speed_x,
+        gravity=(0, gravity),
+    )
+    controller = SeesawController(seed)
+    balloons = sim.no_of_ballons
+
+    # Tick of the last popped balloon
+    last_pop = 0
+    left_over = balloons
+    stalled = False
+
+    while not sim.is_over and sim.ticks < max_ticks:
+        left, right, flip = controller(sim)
+        sim.step(left=left, right=right, flip=flip)
+
+        if sim.no_of_ballons != left_over:
+            left_over = sim.no_of_ballons
+            last_pop = sim.ticks
+        elif sim.ticks - last_pop >= STALL_TICKS:
+            stalled = True
+            break
+
+    return GameResult(
+        seed=seed,
+        balloon_rows=rows,
+        balloon_cols=cols,
+        balloon_speed=balloon_speed,
+        player_speed_x=player_speed_x,
+        gravity=gravity,
+        score=sim.player_score,
+        lives_lost=PLAYER_LIVES - sim.player_lives,
+        ticks=sim.ticks,
+        balloons_popped=balloons - sim.no_of_ballons,
+        stalled=stalled,
+    )
+
+
+def get_jobs(args):
+    """
+    Return one job per game: every combination of the level settings, games times
+    """
+    levels = itertools.product(
+        args.rows, args.cols, args.balloon_speed, args.player_speed, args.gravity
+    )
+    seeds = itertools.count(args.seed)
+    for level in levels:
+        for _ in range(args.games):
+            yield (next(seeds), *level, args.max_ticks)
+
+
+def parse_list(cast):
+    """
+    Return a function turning "1,2,3" into a list of values
+    """
+    return lambda text: [cast(value) for value in text.split(",")]
+
+
+def main():
+    """
+    Main method
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--games", type=int, default=100, help="games per combination of level settings")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the first game, the next games count up")
+    parser.add_argument("--rows", type=parse_list(int), default=[BALLOON_ROWS])
+    parser.add_argument("--cols", type=parse_list(int), default=[BALLOON_COLS])
+    parser.add_argument("--balloon-speed", type=parse_list(float), default=[BALLOON_SPEED])
+    parser.add_argument("--player-speed", type=parse_list(float), default=[PLAYER_SPEED_X])
+    parser.add_argument("--gravity", type=parse_list(float), default=[ACROBAT_GRAVITY[1]])
+    parser.add_argument("--max-ticks", type=int, default=MAX_TICKS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--chunksize", type=int, default=16, help="games sent to a worker at a time")
+    parser.add_argument("--output", help="file to write results to, one JSON line per game")
+    parser.add_argument("--scores", help="high score database to add every game's score to")
+    parser.add_argument("--player", default="batch", help="name the scores are added under")
+    args = parser.parse_args()
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    if args.scores:
+        high_scores.start(args.scores)
+
+    games = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for result in executor.map(run_game, get_jobs(args), chunksize=args.chunksize):
+            out.write(json.dumps(result._asdict()) + "\n")
+            if args.scores:
+                high_scores.add(args.player, result.score, ticks=result.ticks, seed=result.seed)
+            games += 1
+    seconds = time.perf_counter() - start
+
+    if out is not sys.stdout:
+        out.close()
+
+    if args.scores:
+        high_scores.stop()
+        print(
+            f"{high_scores.written} scores written to {args.scores} in {high_scores.write_time:.2f} s",
+            file=sys.stderr,
+        )
+
+    print(
+        f"{games} games in {seconds:.1f} s ({games / seconds:.1f} games/s, {args.workers} workers)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
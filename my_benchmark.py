@@ -0,0 +1,258 @@
+"""
+Measure how the cost of a game tick grows with the size of the game.
+
+Runs the Simulation without a window at a fixed seed for a grid of
+balloon rows and columns, live acrobats and active particle emitters.
+For every configuration it reports the mean and p99 time of a tick,
+split into the physics step, the Python side of the simulation and the
+particles, plus memory allocated within a tick and memory kept after
+it. The results are saved as
+JSON so they can be compared across commits.
+
+Run it with: python my_benchmark.py --output bench.json
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+
+from my_simulation import Simulation
+from my_particles import ParticleSystem
+from my_events import BalloonPopped, LifeLost
+
+# Ticks an emitter waits between bursts. About the lifetime of a burst,
+# so each emitter has one burst alive most of the time.
+EMITTER_INTERVAL = 45
+
+
+def get_git_commit():
+    """
+    Return the current git commit, or None outside a git repository
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class BenchmarkGame:
+    """
+    A Simulation with a fixed number of acrobats and emitters
+    """
+
+    def __init__(self, seed, rows, cols, acrobats, emitters, spatial_hash=None, count_contacts=False):
+        self.sim = Simulation(
+            seed=seed,
+            balloon_rows=rows,
+            balloon_cols=cols,
+            spatial_hash=spatial_hash,
+            count_contacts=count_contacts,
+        )
+        self.particles = ParticleSystem(seed=seed)
+        self.emitters = emitters
+
+        # The game must not end during the benchmark
+        self.sim.player_lives = float("inf")
+
+        # The Simulation starts with one acrobat. Dead acrobats are
+        # replaced, so the number of live acrobats stays the same.
+        for _ in range(acrobats - 1):
+            self.sim.spawn_acrobat()
+
+        # Time spent in the physics engine during the current tick
+        self.physics_time = 0.0
+        physics_step = self.sim.physics_engine.step
+
+        def timed_physics_step(*args, **kwargs):
+            start = time.perf_counter()
+            physics_step(*args, **kwargs)
+            self.physics_time += time.perf_counter() - start
+
+        self.sim.physics_engine.step = timed_physics_step
+
+        # Texture for emitter bursts
+        self.texture = self.sim.player_sprite.passanger.texture
+
+    def tick(self, tick):
+        """
+        Run one tick like GameView.on_update. Returns the time of
+        the tick, of the physics step and of the particles.
+        """
+        self.physics_time = 0.0
+        start = time.perf_counter()
+
+        # Move the seesaw back and forth and flip it now and then
+        self.sim.step(
+            left=(tick // 60) % 2 == 0,
+            right=(tick // 60) % 2 == 1,
+            flip=tick % 90 == 0,
+        )
+
+        particles_start = time.perf_counter()
+        for event in self.sim.events:
+            if isinstance(event, (BalloonPopped, LifeLost)):
+                self.particles.burst(event.position, self.texture, 0.25)
+        for i in range(self.emitters):
+            if tick % EMITTER_INTERVAL == i % EMITTER_INTERVAL:
+                self.particles.burst((400, 300), self.texture, 0.25)
+        self.particles.update()
+        end = time.perf_counter()
+
+        return end - start, self.physics_time, end - particles_start
+
+
+def summarize(times, name):
+    """
+    Return mean and p99 of a list of times in seconds, in microseconds
+    """
+    times = np.array(times) * 1e6
+    return {
+        f"{name}_mean_us": round(float(times.mean()), 2),
+        f"{name}_p99_us": round(float(np.percentile(times, 99)), 2),
+    }
+
+
+def run_config(seed, ticks, warmup, rows, cols, acrobats, emitters, spatial_hash=None):
+    """
+    Benchmark one configuration and return its results
+    """
+    game = BenchmarkGame(seed, rows, cols, acrobats, emitters, spatial_hash)
+
+    for tick in range(warmup):
+        game.tick(tick)
+
+    update_times, physics_times, python_times, particle_times = [], [], [], []
+    active = dict.fromkeys(game.sim.scheduler.sizes, 0)
+    pool = game.sim.acrobat_pool
+    pool_hits, pool_misses = pool.hits, pool.misses
+    for tick in range(warmup, warmup + ticks):
+        total, physics, particles = game.tick(tick)
+        update_times.append(total - particles)
+        physics_times.append(physics)
+        python_times.append(total - particles - physics)
+        particle_times.append(particles)
+        for group, size in game.sim.scheduler.sizes.items():
+            active[group] += size
+    pool_hits = pool.hits - pool_hits
+    pool_misses = pool.misses - pool_misses
+
+    # Allocations and contact pairs are measured in a second run,
+    # as tracing and counting slows everything down
+    game = BenchmarkGame(seed, rows, cols, acrobats, emitters, spatial_hash, count_contacts=True)
+    for tick in range(warmup):
+        game.tick(tick)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    contact_pairs = 0
+    alloc_bytes = 0
+    for tick in range(warmup, warmup + ticks):
+        # Memory allocated and freed again within the tick only shows in
+        # the peak, so the peak above the start is counted for each tick
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        game.tick(tick)
+        _, peak = tracemalloc.get_traced_memory()
+        alloc_bytes += peak - start
+        contact_pairs += game.sim.contact_pairs
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    # Memory still held at the end of the run, which grows from tick to tick
+    stats = [s for s in after.compare_to(before, "lineno") if s.size_diff > 0]
+    retained_blocks = sum(s.count_diff for s in stats if s.count_diff > 0)
+    retained_bytes = sum(s.size_diff for s in stats)
+
+    result = {
+        "rows": rows,
+        "cols": cols,
+        "acrobats": acrobats,
+        "emitters": emitters,
+        "balloons_left": game.sim.no_of_ballons,
+    }
+    result.update(summarize(update_times, "update"))
+    result.update(summarize(physics_times, "physics"))
+    result.update(summarize(python_times, "python"))
+    result.update(summarize(particle_times, "particles"))
+    result["alloc_peak_bytes_per_tick"] = round(alloc_bytes / ticks, 2)
+    result["retained_blocks_per_tick"] = round(retained_blocks / ticks, 2)
+    result["retained_bytes_per_tick"] = round(retained_bytes / ticks, 2)
+    result["contact_pairs_per_tick"] = round(contact_pairs / ticks, 2)
+    for group, total in active.items():
+        result[f"active_{group}_per_tick"] = round(total / ticks, 2)
+
+    # Acrobats spawned from the pool and built new while measuring
+    result["pool_hits"] = pool_hits
+    result["pool_misses"] = pool_misses
+    return result
+
+
+def parse_list(text):
+    """
+    Turn "1,2,3" into [1, 2, 3]
+    """
+    return [int(value) for value in text.split(",")]
+
+
+def main():
+    """
+    Main method
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=parse_list, default=[3, 10], help="balloon rows to try, comma separated")
+    parser.add_argument("--cols", type=parse_list, default=[10, 50], help="balloon columns to try, comma separated")
+    parser.add_argument("--acrobats", type=parse_list, default=[1, 10], help="live acrobats to try, comma separated")
+    parser.add_argument("--emitters", type=parse_list, default=[0, 20], help="active emitters to try, comma separated")
+    parser.add_argument("--ticks", type=int, default=600, help="ticks to measure per configuration")
+    parser.add_argument("--warmup", type=int, default=60, help="ticks to run before measuring")
+    parser.add_argument("--spatial-hash", type=parse_list, help="use a pymunk spatial hash with CELL_SIZE,COUNT")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="file to save the results in as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for rows, cols, acrobats, emitters in itertools.product(
+        args.rows, args.cols, args.acrobats, args.emitters
+    ):
+        result = run_config(
+            args.seed, args.ticks, args.warmup, rows, cols, acrobats, emitters, args.spatial_hash
+        )
+        results.append(result)
+        print(
+            f"rows={rows:<4} cols={cols:<4} acrobats={acrobats:<4} emitters={emitters:<4} "
+            f"update={result['update_mean_us']:>9.1f}us p99={result['update_p99_us']:>9.1f}us "
+            f"physics={result['physics_mean_us']:>9.1f}us python={result['python_mean_us']:>9.1f}us "
+            f"particles={result['particles_mean_us']:>8.1f}us "
+            f"alloc={result['alloc_peak_bytes_per_tick']:>9.0f} bytes/tick "
+            f"retained={result['retained_bytes_per_tick']:>7.1f} bytes/tick "
+            f"contacts={result['contact_pairs_per_tick']:>5.1f}/tick "
+            f"active={result['active_dying_per_tick'] + result['active_seesaw_per_tick']:>5.1f}/tick "
+            f"pool={result['pool_hits']}/{result['pool_hits'] + result['pool_misses']} reused"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "commit": get_git_commit(),
+                    "python": platform.python_version(),
+                    "seed": args.seed,
+                    "ticks": args.ticks,
+                    "spatial_hash": args.spatial_hash,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Camera for playfields larger than the window.
+
+Viewport works out which part of the playfield is shown. It follows a
+target, stays inside the playfield and says what is on screen, so the
+game can skip syncing and drawing the rest. GameView moves an
+arcade.Camera to the viewport's corner before drawing.
+"""
+
+# Part of the way to its target the camera moves each frame, 1 is instant
+CAMERA_SPEED = 0.1
+
+# Sprites this far outside the screen are still drawn, so nothing pops in
+CULL_MARGIN = 50
+
+
+def clamp(value, low, high):
+    return max(low, min(value, high))
+
+
+class Viewport:
+    """
+    The part of the playfield shown in the window
+    """
+
+    def __init__(self, width, height, playfield_width, playfield_height, speed=CAMERA_SPEED):
+        self.width = width
+        self.height = height
+        self.speed = speed
+        self.set_playfield(playfield_width, playfield_height)
+
+        # Bottom left corner in the playfield
+        self.left = 0.0
+        self.bottom = 0.0
+
+    def set_playfield(self, width, height):
+        """
+        Change the size of the playfield, such as on a new level
+        """
+        self.playfield_width = width
+        self.playfield_height = height
+
+    @property
+    def right(self):
+        return self.left + self.width
+
+    @property
+    def top(self):
+        return self.bottom + self.height
+
+    def follow(self, x, y, snap=False):
+        """
+        Move towards showing (x, y) in the center. With snap the move is instant.
+        """
+        goal_left = clamp(x - self.width / 2, 0, max(0, self.playfield_width - self.width))
+        goal_bottom = clamp(y - self.height / 2, 0, max(0, self.playfield_height - self.height))
+
+        speed = 1.0 if snap else self.speed
+        self.left += (goal_left - self.left) * speed
+        self.bottom += (goal_bottom - self.bottom) * speed
+
+    def shows_y(self, bottom, top, margin=CULL_MARGIN):
+        """
+        True if anything between bottom and top is on screen
+        """
+        return top >= self.bottom - margin and bottom <= self.top + margin
+
+    def get_x_range(self, margin=CULL_MARGIN):
+        """
+        Return the left and right edges of the screen with a margin
+        """
+        return self.left - margin, self.right + margin
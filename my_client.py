@@ -0,0 +1,738 @@
+"""
+Client for two-player games over UDP.
+
+GameClient connects to a server from my_server.py, sends one input per
+tick and decodes the states the server sends back. The seesaw reacts to
+the player's input at once: it is drawn where the last state put it,
+moved by the inputs the server has not used yet. When a state disagrees
+with that prediction, the difference is smoothed out over a few ticks.
+Everything else is drawn INTERPOLATION_DELAY states in the past, between
+the two states around that time, so it moves smoothly even when packets
+are late or lost.
+
+Play against someone else connecting to the same server with:
+
+    python my_client.py --host 127.0.0.1
+
+or let a bot play without a window with --bot.
+"""
+
+import argparse
+import math
+import select
+import socket
+import struct
+import time
+import zlib
+from collections import deque
+
+import arcade
+
+from my_simulation import (
+    SPRITE_SCALING,
+    SCREEN_WIDTH,
+    SCREEN_HEIGHT,
+    TICK_RATE,
+    PLAYER_SPEED_X,
+    PLAYER_START_X,
+    PLAYER_START_Y,
+    MOVE_STEPS,
+    get_balloons,
+    get_walls,
+    get_seesaw_speed,
+)
+from my_sprites import Acrobat, Player
+from my_levels import level_loader
+from my_input import InputQueue, joystick_watcher
+from my_camera import Viewport
+from my_textures import texture_registry
+from my_replay import pack_input, unpack_input
+from my_timestep import FixedTimestep, lerp_angle, TELEPORT_DISTANCE
+from my_net import (
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    MAGIC,
+    PROTOCOL_VERSION,
+    MAX_PACKET_SIZE,
+    SEND_INTERVAL,
+    STATE_HISTORY,
+    INPUT_REDUNDANCY,
+    PACKET_TYPE,
+    PACKET_HELLO,
+    PACKET_WAITING,
+    PACKET_WELCOME,
+    PACKET_INPUT,
+    PACKET_STATE,
+    PACKET_BYE,
+    HELLO,
+    WELCOME,
+    INPUT,
+    INPUT_RECORD,
+    STATE,
+    BYE,
+    STATE_KEYFRAME,
+    decode_state,
+    decompress_state,
+    get_time_ms,
+    LossyLink,
+    Traffic,
+)
+
+# Seconds between hellos while connecting
+HELLO_INTERVAL = 0.5
+
+# Seconds without a state before the server counts as gone
+CONNECTION_TIMEOUT = 5.0
+
+# Everything but the seesaw is drawn this many states in the past
+INTERPOLATION_DELAY = 2
+
+# States kept for interpolation
+INTERPOLATION_STATES = 32
+
+# Ticks acrobats are moved on with their velocity when no newer state has come
+MAX_EXTRAPOLATION = 10
+
+# Inputs kept while the server has not used them
+MAX_PENDING_INPUTS = 120
+
+# Part of a prediction error left after each tick
+CORRECTION_DECAY = 0.8
+
+# How fast the estimate of the server's clock follows new states
+CLOCK_SMOOTHING = 0.05
+
+
+class GameClient:
+    """
+    The connection to a server, with predicted and interpolated state
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, latency=0.0, jitter=0.0, loss=0.0, seed=None):
+        """
+        latency and jitter in seconds and loss as a fraction are applied
+        to the packets the client sends
+        """
+        self.server = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.link = LossyLink(self.sock, latency, jitter, loss, seed)
+        self.traffic = Traffic()
+
+        # "connecting", "waiting" for an opponent, "playing" or "closed"
+        self.status = "connecting"
+        self.no_opponent = False
+        self.last_hello = None
+        self.last_state_time = None
+
+        # Sent by the server in the welcome
+        self.token = None
+        self.player = None
+        self.level = None
+        self.tick_rate = TICK_RATE
+        self.send_interval = SEND_INTERVAL
+
+        # Decoded states by tick, to decode the next ones against
+        self.history = {}
+        # (tick, NetState) of the last states, oldest first, for interpolation
+        self.states = deque(maxlen=INTERPOLATION_STATES)
+        self.latest_tick = None
+        self.latest = None
+
+        # (number, input bits, move steps) of inputs the server has not used yet
+        self.pending = deque(maxlen=MAX_PENDING_INPUTS)
+        self.input_number = 0
+
+        # Prediction error still to be smoothed out, and how often it happened
+        self.smoothing = 0.0
+        self.corrections = 0
+        self.correction_total = 0.0
+
+        # Server time minus local time, in seconds, and round trip time
+        self.clock_offset = None
+        self.rtt = None
+
+        # States that came too late to decode or could not be read
+        self.undecodable = 0
+        self.bad_packets = 0
+
+    @property
+    def speed(self):
+        """
+        How far the seesaw moves in a tick
+        """
+        return PLAYER_SPEED_X * TICK_RATE / self.tick_rate
+
+    @property
+    def is_over(self):
+        """
+        True once both games are over, or the server is gone
+        """
+        if self.status == "closed":
+            return True
+        return self.latest is not None and self.latest.over and self.latest.opponent_over
+
+    def send(self, data):
+        self.traffic.sent(len(data))
+        self.link.sendto(data, self.server)
+
+    def poll(self):
+        """
+        Handle the packets that came in and send what is due
+        """
+        while True:
+            try:
+                data, address = self.sock.recvfrom(MAX_PACKET_SIZE)
+            except (BlockingIOError, InterruptedError):
+                break
+            except ConnectionResetError:
+                continue
+            if address != self.server:
+                continue
+            self.traffic.received(len(data))
+            try:
+                self.handle_packet(data)
+            except (struct.error, zlib.error, ValueError):
+                self.bad_packets += 1
+
+        now = time.perf_counter()
+        if self.status in ("connecting", "waiting"):
+            if self.last_hello is None or now - self.last_hello >= HELLO_INTERVAL:
+                self.last_hello = now
+                self.send(HELLO.pack(PACKET_HELLO, MAGIC, PROTOCOL_VERSION))
+        elif self.status == "playing" and self.last_state_time is not None:
+            if now - self.last_state_time > CONNECTION_TIMEOUT:
+                self.status = "closed"
+
+        self.link.flush()
+
+    def handle_packet(self, data):
+        (packet_type,) = PACKET_TYPE.unpack_from(data)
+
+        if packet_type == PACKET_WAITING:
+            if self.status == "connecting":
+                self.status = "waiting"
+
+        elif packet_type == PACKET_WELCOME:
+            if self.status in ("connecting", "waiting"):
+                _, self.token, self.player, level, self.tick_rate, self.send_interval = WELCOME.unpack_from(data)
+                self.level = None if level < 0 else level
+                self.status = "playing"
+                self.last_state_time = time.perf_counter()
+
+        elif packet_type == PACKET_STATE:
+            if self.status == "playing":
+                self.handle_state(data)
+
+        elif packet_type == PACKET_BYE:
+            # Nobody came to play
+            if self.status == "waiting":
+                self.status = "closed"
+                self.no_opponent = True
+
+        else:
+            self.bad_packets += 1
+
+    def handle_state(self, packet):
+        """
+        Decode a state and take it as the newest if it is
+        """
+        _, tick, baseline_tick, last_input, echo_ms, flags = STATE.unpack_from(packet)
+        if tick in self.history:
+            return
+
+        baseline = None
+        if not flags & STATE_KEYFRAME:
+            baseline = self.history.get(baseline_tick)
+            if baseline is None:
+                self.undecodable += 1
+                return
+        data = decompress_state(packet[STATE.size:], baseline)
+        state = decode_state(data)
+
+        now = time.perf_counter()
+        self.last_state_time = now
+
+        history = self.history
+        history[tick] = data
+        while len(history) > STATE_HISTORY:
+            del history[min(history)]
+
+        # States can come out of order
+        self.states.append((tick, state))
+        if len(self.states) > 1 and self.states[-2][0] > tick:
+            self.states = deque(sorted(self.states, key=lambda s: s[0]), maxlen=INTERPOLATION_STATES)
+
+        # The server's clock, from the fastest states
+        sample = tick / self.tick_rate - now
+        if self.clock_offset is None or abs(sample - self.clock_offset) > 0.5:
+            self.clock_offset = sample
+        else:
+            self.clock_offset += (sample - self.clock_offset) * CLOCK_SMOOTHING
+
+        if self.latest_tick is not None and tick < self.latest_tick:
+            return
+
+        if echo_ms:
+            rtt = ((get_time_ms() - echo_ms) & 0xFFFFFFFF) / 1000
+            self.rtt = rtt if self.rtt is None else self.rtt * 0.9 + rtt * 0.1
+
+        # The prediction before and after the server's word
+        before = self.predict()[0] if self.latest is not None else None
+        self.latest_tick = tick
+        self.latest = state
+        while self.pending and self.pending[0][0] <= last_input:
+            self.pending.popleft()
+        after = self.predict()[0]
+
+        if before is not None and abs(before - after) > 0.5:
+            self.corrections += 1
+            self.correction_total += abs(before - after)
+            self.smoothing += before - after
+
+    def send_input(self, left, right, flip, move=0.0):
+        """
+        Send the input of the next tick, and the inputs the server has not used yet
+        """
+        if self.status != "playing":
+            return
+
+        self.smoothing *= CORRECTION_DECAY
+        self.input_number += 1
+        self.pending.append((self.input_number, pack_input(left, right, flip), round(move * MOVE_STEPS)))
+
+        records = list(self.pending)[-INPUT_REDUNDANCY:]
+        self.send(INPUT.pack(
+            PACKET_INPUT,
+            self.token,
+            self.latest_tick or 0,
+            get_time_ms(),
+            self.input_number,
+            len(records),
+        ) + b"".join(INPUT_RECORD.pack(bits, steps) for _, bits, steps in records))
+
+    def predict(self):
+        """
+        Return the seesaw's x and whether its left side is down, after the inputs not used yet
+        """
+        x = self.latest.seesaw_x
+        left_side_down = self.latest.left_side_down
+        for _, bits, steps in self.pending:
+            left, right, flip = unpack_input(bits)
+            if flip:
+                left_side_down = not left_side_down
+            x += get_seesaw_speed(left, right, steps / MOVE_STEPS, self.speed)
+        return x, left_side_down
+
+    def get_seesaw(self):
+        """
+        Return where to draw the seesaw, as (x, left side down)
+        """
+        x, left_side_down = self.predict()
+        return x + self.smoothing, left_side_down
+
+    def get_render_tick(self):
+        """
+        The server tick to draw everything but the seesaw at
+        """
+        server_tick = (time.perf_counter() + self.clock_offset) * self.tick_rate
+        return server_tick - INTERPOLATION_DELAY * self.send_interval
+
+    def get_view(self, render_tick=None):
+        """
+        Return (rows, acrobats) to draw: the x of every balloon row's body
+        with its alive bytes, and (x, y, angle in degrees) of every acrobat
+        """
+        if render_tick is None:
+            render_tick = self.get_render_tick()
+        states = self.states
+
+        # The states around the render tick
+        after = None
+        for i, (tick, _) in enumerate(states):
+            if tick > render_tick:
+                after = i
+                break
+
+        if after is None:
+            # Past the newest state: move on with the velocities for a while
+            tick, state = states[-1]
+            seconds = min(render_tick - tick, MAX_EXTRAPOLATION) / self.tick_rate
+            rows = [(x, alive) for x, alive in state.rows]
+            acrobats = [
+                (x + velocity_x * seconds, y + velocity_y * seconds, math.degrees(angle))
+                for x, y, velocity_x, velocity_y, angle, _ in state.acrobats
+            ]
+            return rows, acrobats
+
+        if after == 0:
+            state = states[0][1]
+            return list(state.rows), [(x, y, math.degrees(a)) for x, y, _, _, a, _ in state.acrobats]
+
+        tick0, state0 = states[after - 1]
+        tick1, state1 = states[after]
+        alpha = (render_tick - tick0) / (tick1 - tick0)
+
+        rows = list(state0.rows)
+        if len(state0.rows) == len(state1.rows):
+            rows = [
+                (x0 + (x1 - x0) * alpha, alive)
+                for (x0, alive), (x1, _) in zip(state0.rows, state1.rows)
+            ]
+
+        # Acrobats come and go, so only those in both states at about the same place move smoothly
+        acrobats = []
+        for i, (x1, y1, _, _, angle1, _) in enumerate(state1.acrobats):
+            if i < len(state0.acrobats):
+                x0, y0, _, _, angle0, _ = state0.acrobats[i]
+                if abs(x1 - x0) + abs(y1 - y0) < TELEPORT_DISTANCE:
+                    acrobats.append((
+                        x0 + (x1 - x0) * alpha,
+                        y0 + (y1 - y0) * alpha,
+                        lerp_angle(math.degrees(angle0), math.degrees(angle1), alpha),
+                    ))
+                    continue
+            acrobats.append((x1, y1, math.degrees(angle1)))
+
+        return rows, acrobats
+
+    def close(self):
+        """
+        Tell the server the client is leaving
+        """
+        if self.token is not None and self.status == "playing":
+            bye = BYE.pack(PACKET_BYE, self.token)
+            for _ in range(3):
+                try:
+                    self.sock.sendto(bye, self.server)
+                except OSError:
+                    pass
+        self.status = "closed"
+        self.sock.close()
+
+    def report(self):
+        """
+        Return lines with the client's bandwidth, round trip time and prediction errors
+        """
+        out_rate, in_rate = self.traffic.rates()
+        lines = [
+            f"player={self.player} out={out_rate:.1f}kbit/s in={in_rate:.1f}kbit/s "
+            f"rtt={(self.rtt or 0) * 1000:.0f}ms undecodable={self.undecodable} "
+            f"link_dropped={self.link.dropped}"
+        ]
+        if self.corrections:
+            lines.append(
+                f"corrections={self.corrections} mean={self.correction_total / self.corrections:.1f}px"
+            )
+        if self.latest is not None:
+            lines.append(
+                f"score={self.latest.score} lives={self.latest.lives} "
+                f"opponent_score={self.latest.opponent_score} opponent_lives={self.latest.opponent_lives}"
+            )
+        return lines
+
+
+class ClientWorld:
+    """
+    The sprites of a player's game, placed from the states of a GameClient
+    """
+
+    def __init__(self, level_number):
+        self.load(level_number)
+
+    def load(self, level_number):
+        """
+        Build the walls, balloons, seesaw and acrobats of a level
+        """
+        self.level_number = level_number
+        self.level = level = level_loader.get(level_number)
+
+        self.walls = get_walls(level)
+
+        # (row data, balloons) of each row, and where the balloons started
+        self.rows = list(zip(level.balloon_rows, get_balloons(level, use_spatial_hash=False)))
+        self.alive = [bytearray(b"\x01" * len(balloons)) for _, balloons in self.rows]
+        self.balloon_layer = arcade.SpriteList()
+        for _, balloons in self.rows:
+            self.balloon_layer.extend(balloons)
+
+        # Popped balloons fading out
+        self.dying = []
+
+        self.acrobats = arcade.SpriteList()
+        self.acrobat_sprites = []
+
+        self.player = Player(
+            center_x=PLAYER_START_X,
+            center_y=PLAYER_START_Y,
+            min_x_pos=0,
+            max_x_pos=level.width,
+            scale=SPRITE_SCALING,
+        )
+        self.player_layer = arcade.SpriteList()
+        self.player_layer.append(self.player)
+        self.player_layer.append(self.player.passanger)
+
+    def update(self, rows, acrobats, seesaw_x, left_side_down):
+        """
+        Move the sprites to a view from GameClient.get_view() and GameClient.get_seesaw()
+        """
+        for i, ((row, balloons), (body_x, alive)) in enumerate(zip(self.rows, rows)):
+            was_alive = self.alive[i]
+            period = row.max_x - row.min_x
+            for column, b in enumerate(balloons):
+                if alive[column]:
+                    b.center_x = row.min_x + (row.xs[column] + body_x - row.min_x) % period
+                elif was_alive[column]:
+                    b.start_death_sequence()
+                    self.dying.append(b)
+            was_alive[:] = alive
+
+        # One sprite per acrobat, kept for reuse
+        while len(self.acrobat_sprites) < len(acrobats):
+            self.acrobat_sprites.append(Acrobat(0, 0, scale=SPRITE_SCALING))
+        for sprite in self.acrobat_sprites[len(acrobats):]:
+            if sprite in self.acrobats:
+                self.acrobats.remove(sprite)
+        for sprite, (x, y, angle) in zip(self.acrobat_sprites, acrobats):
+            if sprite not in self.acrobats:
+                self.acrobats.append(sprite)
+            sprite.position = (x, y)
+            sprite.angle = angle
+
+        player = self.player
+        player.center_x = seesaw_x
+        if player.left_side_down != left_side_down:
+            player.flip()
+        player.follow()
+
+    def fade(self):
+        """
+        Fade the popped balloons a step. Call once per tick.
+        """
+        self.dying = [b for b in self.dying if b.fade()]
+
+    def draw(self):
+        self.walls.draw()
+        self.acrobats.draw()
+        self.balloon_layer.draw()
+        self.player_layer.draw()
+
+
+class NetworkView(arcade.View):
+    """
+    The view of a two-player game. Sends input to the server and draws what it sends back.
+    """
+
+    def __init__(self, client, window=None):
+        super().__init__(window)
+        self.client = client
+        self.world = None
+
+    def on_show_view(self):
+        """
+        This is run every time we switch to this view
+        """
+        # Keyboard and joystick events, turned into one input per tick. The
+        # joystick is looked for at startup only, as scans stall a frame.
+        self.input = InputQueue()
+        joystick_watcher.attach(self.input)
+        joystick_watcher.set_scanning(False)
+        self.timestep = FixedTimestep(self.client.tick_rate)
+
+        # The world is drawn through a camera following the seesaw, the text through one that stays put
+        self.viewport = Viewport(self.window.width, self.window.height, SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.camera = arcade.Camera(self.window.width, self.window.height)
+        self.gui_camera = arcade.Camera(self.window.width, self.window.height)
+
+        self.status_text = arcade.Text(
+            "",
+            self.window.width / 2,
+            self.window.height / 2,
+            arcade.color.WHITE,
+            font_size=20,
+            anchor_x="center",
+        )
+        self.score_text = arcade.Text("", 10, self.window.height - 20, arcade.color.WHITE)
+        self.opponent_text = arcade.Text(
+            "", self.window.width - 10, self.window.height - 20, arcade.color.WHITE, anchor_x="right"
+        )
+        self.shown = None
+
+        arcade.set_background_color(arcade.color.AMAZON)
+
+    def on_update(self, delta_time):
+        """
+        Talk to the server and send one input per tick
+        """
+        client = self.client
+        client.poll()
+
+        if client.tick_rate != round(1 / self.timestep.tick_time):
+            self.timestep = FixedTimestep(client.tick_rate)
+
+        for _ in range(self.timestep.advance(delta_time)):
+            client.send_input(*self.input.poll())
+            if self.world is not None:
+                self.world.fade()
+
+        # A new level, or the first state
+        latest = client.latest
+        if latest is not None and (self.world is None or latest.level != self.world.level_number):
+            if self.world is None:
+                self.world = ClientWorld(latest.level)
+            else:
+                self.world.load(latest.level)
+            texture_registry.pack(self.window.ctx.default_atlas)
+            self.viewport.set_playfield(self.world.level.width, self.world.level.height)
+
+    def on_draw(self):
+        """
+        Render the screen.
+        """
+        self.clear()
+        client = self.client
+
+        if self.world is not None and client.states:
+            rows, acrobats = client.get_view()
+            x, left_side_down = client.get_seesaw()
+            self.world.update(rows, acrobats, x, left_side_down)
+
+            y = min((a[1] for a in acrobats), default=PLAYER_START_Y)
+            self.viewport.follow(x, y)
+            self.camera.move_to((self.viewport.left, self.viewport.bottom))
+            self.camera.use()
+            self.world.draw()
+
+        self.gui_camera.use()
+        self.update_hud()
+        self.score_text.draw()
+        self.opponent_text.draw()
+        self.status_text.draw()
+
+    def update_hud(self):
+        """
+        Change the texts, only if what they show has changed
+        """
+        client = self.client
+        latest = client.latest
+        shown = (client.status, latest and (latest.score, latest.lives, latest.over,
+                 latest.opponent_score, latest.opponent_lives, latest.opponent_over, latest.opponent_gone))
+        if shown == self.shown:
+            return
+        self.shown = shown
+
+        status = {
+            "connecting": "Connecting...",
+            "waiting": "Waiting for an opponent",
+            "closed": "The server is gone. Press Escape to quit.",
+        }.get(client.status, "")
+        if client.no_opponent:
+            status = "No opponent came. Press Escape to quit."
+        if latest is not None:
+            self.score_text.text = f"SCORE: {latest.score}  LIVES: {latest.lives}"
+            self.opponent_text.text = f"OPPONENT: {latest.opponent_score}  LIVES: {latest.opponent_lives}"
+            if latest.opponent_gone and not latest.over:
+                status = "Your opponent left"
+            if client.is_over:
+                if latest.score > latest.opponent_score:
+                    result = "You won"
+                elif latest.score < latest.opponent_score:
+                    result = "You lost"
+                else:
+                    result = "A draw"
+                status = f"{result} {latest.score} to {latest.opponent_score}. Press Escape to quit."
+            elif latest.over:
+                status = "Game over. Waiting for your opponent"
+        self.status_text.text = status
+
+    def on_key_press(self, key, modifiers):
+        if key == arcade.key.ESCAPE:
+            self.window.close()
+            return
+        self.input.on_key_press(key, modifiers)
+
+    def on_key_release(self, key, modifiers):
+        self.input.on_key_release(key, modifiers)
+
+
+def run_bot(client, duration=None, seed=None):
+    """
+    Play with the scripted controller from my_batch.py until the match ends
+    """
+    from my_batch import SeesawController
+
+    controller = SeesawController(seed)
+    seesaw_width = Player(0, 0, scale=SPRITE_SCALING).width
+    timestep = FixedTimestep(client.tick_rate)
+
+    start = last = time.perf_counter()
+    while not client.is_over:
+        now = time.perf_counter()
+        if duration is not None and now - start >= duration:
+            break
+
+        client.poll()
+        for _ in range(timestep.advance(now - last)):
+            left = right = flip = False
+            if client.latest is not None:
+                x, left_side_down = client.predict()
+                falling = [(ax, ay) for ax, ay, _, vy, _, _ in client.latest.acrobats if vy < 0]
+                left, right, flip = controller.steer(x, seesaw_width, left_side_down, falling, client.speed)
+            client.send_input(left, right, flip)
+        last = now
+
+        timeout = timestep.tick_time - timestep.accumulator
+        due = client.link.next_due()
+        if due is not None:
+            timeout = min(timeout, due)
+        select.select([client.sock], [], [], max(timeout, 0.0))
+
+
+def run_window(client):
+    """
+    Play in a window
+    """
+    window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT)
+    joystick_watcher.start()
+    window.show_view(NetworkView(client))
+    arcade.run()
+
+
+def main():
+    """
+    Main method
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--bot", action="store_true", help="let a bot play without a window")
+    parser.add_argument("--latency", type=float, default=0.0, help="ms added to every packet sent")
+    parser.add_argument("--jitter", type=float, default=0.0, help="ms of random latency either way")
+    parser.add_argument("--loss", type=float, default=0.0, help="percent of packets dropped")
+    parser.add_argument("--duration", type=float, help="seconds to play at most")
+    parser.add_argument("--seed", type=int, help="seed of the packet loss and the bot")
+    args = parser.parse_args()
+
+    client = GameClient(
+        args.host,
+        args.port,
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        loss=args.loss / 100,
+        seed=args.seed,
+    )
+    try:
+        if args.bot:
+            run_bot(client, args.duration, args.seed)
+        else:
+            run_window(client)
+    finally:
+        client.close()
+
+    for line in client.report():
+        print(f"client {line}")
+
+
+if __name__ == "__main__":
+    main()
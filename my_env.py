@@ -0,0 +1,216 @@
+"""
+The game as a reinforcement learning environment.
+
+CircusEnv wraps one Simulation with reset() and step(action). VectorEnv
+steps K games per call and writes all observations into one
+preallocated NumPy array, without rendering.
+
+Actions match the keys in GameView.on_key_press:
+
+    ACTION_NONE, ACTION_LEFT, ACTION_RIGHT, ACTION_FLIP
+
+An observation is a float32 array laid out as:
+
+    seesaw x, seesaw tilt (-1 left side down, 1 right side down), score,
+    MAX_ACROBATS times (present, x, y, velocity x, velocity y),
+    balloon alive mask, row after row, padded with zeros
+
+The mask has room for the most balloons of any level the game can
+reach, so the observation keeps its size when the game moves on to a
+level with more balloons.
+
+Rewards come from the game events: REWARD_BALLOON for each popped
+balloon and REWARD_LIFE_LOST for each acrobat hitting the floor or the
+wrong side of the seesaw.
+"""
+
+import numpy as np
+
+from my_simulation import Simulation, BALLOON_ROWS, BALLOON_COLS
+from my_levels import level_loader, has_level
+from my_events import BalloonPopped, LifeLost
+
+ACTION_NONE = 0
+ACTION_LEFT = 1
+ACTION_RIGHT = 2
+ACTION_FLIP = 3
+
+# (left, right, flip) for each action
+ACTION_INPUTS = {
+    ACTION_NONE: (False, False, False),
+    ACTION_LEFT: (True, False, False),
+    ACTION_RIGHT: (False, True, False),
+    ACTION_FLIP: (False, False, True),
+}
+
+REWARD_BALLOON = 1.0
+REWARD_LIFE_LOST = -1.0
+
+# Acrobats included in an observation
+MAX_ACROBATS = 4
+ACROBAT_VALUES = 5
+
+# Ticks before an episode is cut off
+MAX_EPISODE_TICKS = 5 * 60 * 60
+
+
+def get_observation_size(level=None, rows=BALLOON_ROWS, cols=BALLOON_COLS):
+    """
+    Return the length of an observation for a game starting on level, or
+    for a single level of balloon rows and columns if level is None
+    """
+    if level is None:
+        balloons = rows * cols
+    else:
+        # The most balloons of the level and of every level after it
+        balloons = 0
+        while has_level(level):
+            balloons = max(balloons, level_loader.get(level).balloon_count)
+            level += 1
+    return 3 + MAX_ACROBATS * ACROBAT_VALUES + balloons
+
+
+def get_settings_observation_size(settings):
+    """
+    Return the length of an observation for the Simulation settings of an environment
+    """
+    return get_observation_size(
+        settings.get("level"),
+        settings.get("balloon_rows", BALLOON_ROWS),
+        settings.get("balloon_cols", BALLOON_COLS),
+    )
+
+
+def write_observation(sim, out):
+    """
+    Write the observation of a Simulation into the array out
+    """
+    player = sim.player_sprite
+    out[0] = player.center_x
+    out[1] = -1.0 if player.left_side_down else 1.0
+    out[2] = sim.player_score
+
+    # Acrobats, read from their pymunk bodies
+    acrobats = out[3:3 + MAX_ACROBATS * ACROBAT_VALUES].reshape(MAX_ACROBATS, ACROBAT_VALUES)
+    acrobats[:] = 0.0
+    for i, a in enumerate(sim.acrobats[:MAX_ACROBATS]):
+        body = sim.physics_engine.get_physics_object(a).body
+        acrobats[i] = (1.0, body.position.x, body.position.y, body.velocity.x, body.velocity.y)
+
+    # Balloon alive masks, copied straight from the rows
+    offset = 3 + MAX_ACROBATS * ACROBAT_VALUES
+    for row in sim.balloon_rows:
+        n = len(row.alive)
+        out[offset:offset + n] = np.frombuffer(row.alive, dtype=np.uint8)
+        offset += n
+
+    # Room for the balloons of bigger levels
+    out[offset:] = 0.0
+
+
+def get_reward(events):
+    """
+    Return the reward for the events of a step
+    """
+    reward = 0.0
+    for event in events:
+        if isinstance(event, BalloonPopped):
+            reward += REWARD_BALLOON
+        elif isinstance(event, LifeLost):
+            reward += REWARD_LIFE_LOST
+    return reward
+
+
+class CircusEnv:
+    """
+    One game with a reset/step interface
+    """
+
+    def __init__(self, max_ticks=MAX_EPISODE_TICKS, **settings):
+        """
+        settings are passed on to the Simulation, e.g. balloon_rows
+        """
+        self.settings = settings
+        self.max_ticks = max_ticks
+        self.observation_size = get_settings_observation_size(settings)
+        self.observation = np.zeros(self.observation_size, dtype=np.float32)
+        self.sim = None
+
+    def reset(self, seed=None):
+        """
+        Start a new game and return its first observation
+        """
+        self.sim = Simulation(seed=seed, **self.settings)
+        write_observation(self.sim, self.observation)
+        return self.observation.copy()
+
+    def step(self, action):
+        """
+        Play one tick. Returns observation, reward, done and info.
+        """
+        left, right, flip = ACTION_INPUTS[int(action)]
+        self.sim.step(left=left, right=right, flip=flip)
+
+        write_observation(self.sim, self.observation)
+        reward = get_reward(self.sim.events)
+        done = self.sim.is_over or self.sim.ticks >= self.max_ticks
+        info = {"ticks": self.sim.ticks, "lives": self.sim.player_lives}
+        return self.observation.copy(), reward, done, info
+
+
+class VectorEnv:
+    """
+    K games stepped together. Games that end are reset straight away.
+    """
+
+    def __init__(self, count, seed=0, max_ticks=MAX_EPISODE_TICKS, **settings):
+        self.count = count
+        self.settings = settings
+        self.max_ticks = max_ticks
+        self.next_seed = seed
+
+        self.observation_size = get_settings_observation_size(settings)
+
+        # Results of a step for all games, reused every step
+        self.observations = np.zeros((count, self.observation_size), dtype=np.float32)
+        self.rewards = np.zeros(count, dtype=np.float32)
+        self.dones = np.zeros(count, dtype=bool)
+
+        self.sims = [None] * count
+
+    def new_game(self, i):
+        """
+        Start a new game in slot i
+        """
+        self.sims[i] = Simulation(seed=self.next_seed, **self.settings)
+        self.next_seed += 1
+        write_observation(self.sims[i], self.observations[i])
+
+    def reset(self):
+        """
+        Start new games in all slots and return their observations
+        """
+        for i in range(self.count):
+            self.new_game(i)
+        return self.observations
+
+    def step(self, actions):
+        """
+        Play one tick in every game. Returns observations, rewards and dones
+        as arrays of K. The returned arrays are reused by the next step.
+        When a game is done its observation is the first of a new game.
+        """
+        for i, (sim, action) in enumerate(zip(self.sims, actions)):
+            left, right, flip = ACTION_INPUTS[int(action)]
+            sim.step(left=left, right=right, flip=flip)
+
+            self.rewards[i] = get_reward(sim.events)
+            done = sim.is_over or sim.ticks >= self.max_ticks
+            self.dones[i] = done
+
+            if done:
+                self.new_game(i)
+            else:
+                write_observation(sim, self.observations[i])
+
+        return self.observations, self.rewards, self.dones
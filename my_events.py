@@ -0,0 +1,83 @@
+"""
+Game events.
+
+The collision handlers run inside the physics step, where adding and
+removing bodies is unsafe and slow. They only append events to a queue,
+and the Simulation applies them all after the step.
+"""
+
+from collections import deque
+from typing import NamedTuple
+
+import arcade
+
+
+class BalloonPopped(NamedTuple):
+    """
+    An acrobat hit a balloon
+    """
+    balloon: arcade.Sprite
+    # The BalloonRow the balloon belongs to
+    row: object
+    position: tuple
+
+
+class AcrobatLanded(NamedTuple):
+    """
+    An acrobat landed on the raised side of the seesaw
+    """
+    acrobat: arcade.Sprite
+    # Horizontal distance from the center of the seesaw
+    diff_x: float
+    seesaw_position: tuple
+    seesaw_width: float
+
+
+class LifeLost(NamedTuple):
+    """
+    An acrobat hit the floor or the lowered side of the seesaw
+    """
+    acrobat: arcade.Sprite
+    position: tuple
+
+
+class LevelLoaded(NamedTuple):
+    """
+    All balloons were popped and the next level has been loaded
+    """
+    number: int
+
+
+class EventQueue:
+    """
+    Events waiting to be applied after the physics step
+    """
+
+    def __init__(self):
+        self.events = deque()
+
+        # Sprites with an event in the queue. A sprite can touch
+        # several shapes in one step, but only its first event counts.
+        self.sprites = set()
+
+    def __len__(self):
+        return len(self.events)
+
+    def push(self, event, sprite):
+        """
+        Add an event for a sprite. Returns False if the sprite already has one.
+        """
+        if sprite in self.sprites:
+            return False
+        self.sprites.add(sprite)
+        self.events.append(event)
+        return True
+
+    def drain(self):
+        """
+        Return all queued events in the order they happened and empty the queue
+        """
+        events = list(self.events)
+        self.events.clear()
+        self.sprites.clear()
+        return events
@@ -7,545 +7,422 @@ Artwork from https://kenney.nl/assets/space-shooter-redux
 
 """
 
-import arcade
-import arcade.color
-import random
-
-import arcade.color
-import math
+import atexit
+import os
+import time
 
-# Import sprites from local file my_sprites.py
-from my_sprites import Acrobat, Player, Balloon, Wall
+# Imported first, so the startup trace times all other imports
+from my_startup import startup_trace
 
-# Set the scaling of all sprites in the game
-SPRITE_SCALING = 0.5
+import arcade
 
-# Set the size of the screen
-SCREEN_WIDTH = 800
-SCREEN_HEIGHT = 600
+# The game rules live in my_simulation.py
+from my_simulation import Simulation, SCREEN_WIDTH, SCREEN_HEIGHT, FIRST_LEVEL, preload_textures
+from my_textures import texture_registry
+from my_events import BalloonPopped, LifeLost, LevelLoaded
+from my_profiler import FrameProfiler, NullProfiler
+from my_log import log, DEBUG
+from my_input import InputQueue, joystick_watcher
+from my_timestep import FixedTimestep, Interpolator
+from my_camera import Viewport
+from my_scores import high_scores, SCORES_FILE
+from my_snapshot import restore
 
-# Variables controlling the player
-PLAYER_LIVES = 3
-PLAYER_SPEED_X = 15
-PLAYER_START_X = SCREEN_WIDTH / 2
-PLAYER_START_Y = 50
 PLAYER_SHOT_SPEED = 300
 
-FIRE_KEY = arcade.key.SPACE
-
-# Objects that are not to move, have this mass 
-LARGE_MASS = 9999999999999999999999999
-
+# Time the phases of each frame and save the timings to PROFILE_CSV on exit.
+# Also log debug messages from all categories.
 DEBUG_ENABLED = True
+PROFILE_CSV = "profile.csv"
 
-class GameView(arcade.View):
-    """
-    The view with the game itself
-    """
-
-    def c_balloon_acrobat(self, sprite_balloon, sprite_acrobat, arbiter, space, _data):
-
-        if arbiter.is_first_contact:
-            # self.player_score += 100
-            # Function for creating particles with
-            # the same texture as the balloon
-            get_particle = lambda _: arcade.FadeParticle(
-                filename_or_texture=sprite_balloon.texture,
-                change_xy=arcade.rand_in_circle((0.0, 0.0), 3.0),
-                lifetime=random.uniform(0.5, 1.0),
-                scale=sprite_balloon.scale/2,
-                change_angle=random.randint(-10,10),
-            )
-
-            # Create a burst emitter
-            e = arcade.Emitter(
-                center_xy=sprite_balloon.position,
-                emit_controller=arcade.EmitBurst(random.randint(10, 20)),
-                particle_factory=get_particle
-            )
-
-            # Add the new emitter to the game views list of emitters
-            self.burst_emitters.append(e)
-
-            # Remove the balloon
-            sprite_balloon.kill()
-
-            # update no of balloons in game
-            nb = 0
-            for row in self.balloon_rows:
-                nb += len(row)
-            self.no_of_ballons = nb
+# File to write the log to, None writes to the terminal
+LOG_FILE = None
 
-            self.player_score += 10
+# Record the inputs of each game to this file, so it can be
+# replayed with my_replay.py. None turns recording off.
+RECORDING_FILE = None
 
-            if DEBUG_ENABLED:
-                print("No of Balloons in game:", self.no_of_ballons)
-                         
-    def c_acrobat_floor(self, sprite_acrobat, sprite_floor, arbiter, space, _data):
-        self.add_emitter(
-            scale=sprite_acrobat.scale/2,
-            texture=sprite_acrobat.texture,
-            position=sprite_acrobat.position,
-        )
-        sprite_acrobat.kill()
-        # Player looses a life
-        self.player_sprite.lives -= 1
-        self.spawn_acrobat()
-
-    def c_acrobat_seesaw(self, sprite_acrobat, sprite_seesaw, arbiter, space, _data):
-        # Horizontal distance between sprites
-        diff_x = sprite_acrobat.center_x - sprite_seesaw.center_x
-
-        # Acrobat hits side of seesaw which is down (bad)
-        if diff_x > 0 and sprite_seesaw.left_side_down:
-            # Blood effect
-            self.add_emitter(
-                scale=sprite_acrobat.scale/2,
-                texture=sprite_acrobat.texture,
-                position=sprite_acrobat.position,
-            )
-            # Acrobat dies
-            sprite_acrobat.kill()
-            # Player looses a life
-            self.player_sprite.lives -= 1
-            self.spawn_acrobat()
+# Name the high scores are kept under
+PLAYER_NAME = os.environ.get("MY_GAME_PLAYER") or os.environ.get("USER") or os.environ.get("USERNAME") or "player"
 
-            return
+# High scores shown on the game over screen
+HIGH_SCORES_SHOWN = 5
 
-        # Acrobat hits center = 0.0, sides = 1.0
-        # a_speed_modifier = abs(diff_x)/(sprite_seesaw.width/2)
-        a_speed_modifier = diff_x/(sprite_seesaw.width/2)
+# Key showing and hiding the timings on screen
+PROFILER_OVERLAY_KEY = arcade.key.F3
 
-        #if a_speed_modifier < 0.1:
-        #    sprite_acrobat.kill()
-        #    return
+# Frames between updates of the timings on screen
+PROFILER_OVERLAY_INTERVAL = 30
 
-        # Scale up speed modifier
-        a_speed_modifier *= 2.0
+# Show the intro screen before preparing the game, and prepare it while
+# the intro is shown. Modules only used in the game are imported then too.
+FAST_LAUNCH = True
 
-        print(a_speed_modifier)
+# The profiler shared by all games
+profiler = FrameProfiler() if DEBUG_ENABLED else NullProfiler()
 
-        # Get current velocity of acrobat
-        #a_physics_object = self.physics_engine.get_physics_object(sprite_acrobat)
-        #a_velocity_x, a_velocity_y = a_physics_object.body.velocity
+class GameView(arcade.View):
+    """
+    The view with the game itself. Draws the Simulation and feeds it input.
+    """
 
-        # Modify the velocity of the acrobat with the modifier calculated above.
+    def add_emitter(self, scale, texture, position):
         """
-        self.physics_engine.set_velocity(
-            sprite=sprite_acrobat,
-            velocity=(
-                a_velocity_x * a_speed_modifier,
-                a_velocity_y * a_speed_modifier
-            ),
-        )
+        Add a burst of particles
         """
-        sprite_acrobat.kill()
-        self.flip_player()
-        # Calculate new acrobat's speeds
-        a_x_speed = abs(a_speed_modifier) * 50
-        if diff_x < 0:
-            a_x_speed *= -1
-        a_y_speed = abs(a_speed_modifier) * 400
-
-        self.spawn_acrobat(
-            position=(
-                sprite_seesaw.center_x + -1 * diff_x,
-                sprite_seesaw.center_y + 60),
-            velocity=(a_x_speed, a_y_speed),
-            angular_velocity= -1 * a_speed_modifier
-            )
-        # sprite_seesaw.kill()
-        # pass
-        # self.physics_engine.remove_sprite(sprite_seesaw)
-        # self.add_player_sprite_to_engine()
-
-    def add_emitter(self, scale, texture, position):
-
-        get_particle = lambda _: arcade.FadeParticle(
-            filename_or_texture=texture,
-            change_xy=arcade.rand_in_circle((0.0, 0.0), 3.0),
-            lifetime=random.uniform(0.5, 1.0),
-            scale=scale,
-            change_angle=random.randint(-10,10),
-        )
-
-        # Create a burst emitter
-        e = arcade.Emitter(
-            center_xy=position,
-            emit_controller=arcade.EmitBurst(random.randint(10, 20)),
-            particle_factory=get_particle
-        )
-
-        self.burst_emitters.append(e)
+        self.particles.burst(position=position, texture=texture, scale=scale)
 
-    def get_balloons(self, rows=3,cols=10, balloon_size=30, use_spatial_hash=True):
+    def build_balloon_layer(self, visible_rows=None):
         """
-        Returns a list of SpriteLists with rows of Balloons.
+        Collect the balloons of the rows on screen for drawing, given
+        as row indices, or of all rows of the current level
         """
+        # The balloons on screen are drawn from one SpriteList. Popped
+        # balloons are removed from it when they are killed.
+        rows = self.sim.balloon_rows
+        if visible_rows is not None:
+            rows = [rows[i] for i in visible_rows]
+        self.visible_rows = visible_rows
+        self.balloon_layer = arcade.SpriteList()
+        for row in rows:
+            self.balloon_layer.extend(row.balloons)
 
-        # Balloon rows will alternate between these colors
-        colors = [
-            arcade.color.BABY_BLUE_EYES,
-            arcade.color.PINK,
-            arcade.color.GREEN_YELLOW,
-        ]
-
-        # Build textures from colors
-        textures = []
-        for i, color in enumerate(colors):
-            textures.append(
-                arcade.Texture.create_filled(
-                    name=f"balloon_{i}",
-                    size=(balloon_size, balloon_size),
-                    color=color,
-                )
-            )
-
-        # The max and min x position of the balloons
-        # Positions need to be off screen
-        balloon_min_x = -1 * balloon_size
-        balloon_max_x = SCREEN_WIDTH + balloon_size
-
-        # The space between ballons
-        spacing = round((SCREEN_WIDTH+2*balloon_size)/(cols))
-
-        # The list of SpriteLists to return
-        rows_of_baloons = []
-
-        for row in range(rows):
-            # Add an empty row
-            rows_of_baloons.append(
-                arcade.SpriteList(use_spatial_hash=use_spatial_hash)
-            )
-            for col in range(cols):
-                b = Balloon(
-                    #size=balloon_size,
-                    center_x = col * spacing,
-                    center_y = SCREEN_HEIGHT - 1*balloon_size - row * spacing,
-                    min_x = balloon_min_x,
-                    max_x = balloon_max_x,
-                    # texture = textures[row%len(textures)]
-                    color = colors[row%len(colors)]
-                    )
-
-                # Add balloon to the current row
-                rows_of_baloons[-1].append(b)
-
-        return rows_of_baloons
+    def rebuild_layers(self):
+        """
+        Draw the level the Simulation is on now, after a new level was
+        loaded or a snapshot restored
+        """
+        # The textures were built while the last level was played
+        texture_registry.pack(self.window.ctx.default_atlas)
+        self.build_balloon_layer()
+        self.previous_row_x = []
+        self.viewport.set_playfield(self.sim.width, self.sim.height)
 
-    def get_walls(self, level=1):
+    def restore_snapshot(self, data):
         """
-        Add walls that physics objects will bounce off of
+        Put the game back into a snapshot from my_snapshot.capture(). A
+        snapshot can bring back popped balloons or another level, so the
+        layers are built again.
         """
-        walls = arcade.SpriteList()
+        restore(self.sim, data)
+        self.rebuild_layers()
+        self.particles.clear()
+        self.interpolator.capture([])
+        self.follow_camera(snap=True)
 
-        if level == 1:
-            pw = 80 # Platform width
-            ph = 30 # Platform height
-            py = 200
-            walls.append(Wall(pw/2,py,pw,ph)) # Left
-            walls.append(Wall(SCREEN_WIDTH - pw/2,py,pw,ph)) # Right
+    def __init__(self, window=None):
+        super().__init__(window)
 
-        else:
-            raise Exception("Unsupported level")
+        # Built on the first play-through and reset in place for the next ones
+        self.sim = None
 
-        return walls
+        # When the key starting the game was pressed, or None
+        # once the first frame of the game has been drawn
+        self.start_time = None
 
-    def on_show_view(self):
+    def setup(self):
         """
-        This is run once when we switch to this view
+        Build the Simulation and everything drawn with it
         """
-        # Create a Player object
-        self.player_sprite: Player = Player(
-            center_x=PLAYER_START_X,
-            center_y=PLAYER_START_Y,
-            min_x_pos=0,
-            max_x_pos=SCREEN_WIDTH,
-            scale=SPRITE_SCALING,
-        )
+        # The game rules
+        self.sim = Simulation(level=FIRST_LEVEL, profiler=profiler)
 
-        # Emitters for explosion effects
-        self.burst_emitters: list[arcade.Emitter] = []
+        # Imported here, as NumPy is slow to import and only used in the game
+        from my_particles import ParticleSystem
 
-        # The acrobats in the game
-        self.acrobats = arcade.SpriteList()
+        # Particles for explosion effects
+        self.particles = ParticleSystem()
 
-        # Walls that objects can  bounce off off
-        self.walls = self.get_walls()
-
-        self.physics_engine = arcade.PymunkPhysicsEngine(
-            gravity=(0,0),
-            damping=1.0
-        )
-
-        self.add_player_sprite_to_engine()
-
-        # Add an invisible ceiling
-        self.physics_engine.add_sprite(
-            Wall(SCREEN_WIDTH/2, SCREEN_HEIGHT+5, SCREEN_WIDTH*2, 10),
-            body_type=arcade.PymunkPhysicsEngine.STATIC,
-            collision_type="ceiling",
-            elasticity=1.0,
+        # The player and the passanger are drawn together
+        self.player_layer = arcade.SpriteList()
+        self.player_layer.append(self.sim.player_sprite)
+        self.player_layer.append(self.sim.player_sprite.passanger)
 
+        # Text showing score and lives. Only changed when the values change.
+        self.score_text = arcade.Text(
+            "",  # Text to show
+            10,  # X position
+            SCREEN_HEIGHT - 20,  # Y positon
+            arcade.color.WHITE,  # Color of text
         )
-
-        # Add an invisible floor
-        self.physics_engine.add_sprite(
-            Wall(SCREEN_WIDTH/2, -20/2, SCREEN_WIDTH*2, 20),
-            body_type=arcade.PymunkPhysicsEngine.STATIC,
-            collision_type="floor"
+        self.lives_text = arcade.Text(
+            "",  # Text to show
+            10 * 10,  # X position
+            SCREEN_HEIGHT - 20,  # Y positon
+            arcade.color.WHITE,  # Color of text
         )
 
-        # Add walls
-        self.physics_engine.add_sprite_list(
-            self.walls,
-            body_type=arcade.PymunkPhysicsEngine.STATIC,
-            collision_type="wall",
-            elasticity=1.0,
-            )
-
-        # A list of SpriteLists containing rows of Balloons
-        self.balloon_rows = self.get_balloons()
-
-        # Add Balloons to the physics engine with no gravity
-        # Set their speeds
-        self.no_of_ballons = 0
-        balloon_speed = -20
-        for row in self.balloon_rows:
-            for b in row:
-                self.physics_engine.add_sprite(
-                    sprite=b,
-                    gravity=(0.0, 0.0),
-                    elasticity=1.0,
-                    # friction=0.9,
-                    collision_type="balloon",
-                    # radius=30,
-                    mass=LARGE_MASS,
-                    # max_vertical_velocity=1.0,
-                )
-                self.physics_engine.set_velocity(b, (balloon_speed,0 ))
-                self.no_of_ballons += 1
-            # Flip direction for next row
-            balloon_speed *= -1
-
-        self.physics_engine.add_collision_handler(
-            first_type="balloon",
-            second_type="acrobat",
-            post_handler=self.c_balloon_acrobat
-            )
+        # Timings of the frame phases, shown on screen with PROFILER_OVERLAY_KEY
+        self.show_profiler = False
+        self.profiler_texts = []
 
-        self.physics_engine.add_collision_handler(
-            first_type="acrobat",
-            second_type="floor",
-            post_handler=self.c_acrobat_floor
-            )
+        # Keyboard and joystick events, turned into one input per tick
+        self.input = InputQueue()
+        joystick_watcher.attach(self.input)
 
-        self.physics_engine.add_collision_handler(
-            first_type="acrobat",
-            second_type="seesaw",
-            post_handler=self.c_acrobat_seesaw,
-            )
+        # Runs the game at its tick rate and draws it between ticks
+        self.timestep = FixedTimestep(self.sim.tick_rate)
+        self.interpolator = Interpolator()
+        self.previous_row_x = []
 
-        # Set up the player info
-        self.player_score = 0
-        self.player_lives = PLAYER_LIVES
+        # The playfield can be larger than the window. The world is drawn
+        # through a camera following the game, and the text through one
+        # that stays put.
+        self.viewport = Viewport(self.window.width, self.window.height, self.sim.width, self.sim.height)
+        self.camera = arcade.Camera(self.window.width, self.window.height)
+        self.gui_camera = arcade.Camera(self.window.width, self.window.height)
 
-        # Track the current state of what keys are pressed
-        self.left_pressed = False
-        self.right_pressed = False
-        self.up_pressed = False
-        self.down_pressed = False
+    def restart(self):
+        """
+        Start a new game on the Simulation of the last one. Keeps the physics
+        engine, walls, textures, text and input, and resets the balloons,
+        acrobats, score and lives.
+        """
+        self.sim.reset()
+        self.particles.clear()
 
-        # Get list of joysticks
-        joysticks = arcade.get_joysticks()
+    def on_show_view(self):
+        """
+        This is run every time we switch to this view
+        """
+        # Looking for a joystick opens every input device, too slow during play
+        joystick_watcher.set_scanning(False)
 
-        if joysticks:
-            print("Found {} joystick(s)".format(len(joysticks)))
+        # A game reset in place does not play out exactly like a new game with
+        # the same seed, so recorded games always start from a new Simulation
+        if self.sim is None or RECORDING_FILE:
+            self.setup()
+        else:
+            self.restart()
 
-            # Use 1st joystick found
-            self.joystick = joysticks[0]
+        # Records the inputs of the game
+        self.recorder = None
+        if RECORDING_FILE:
+            from my_replay import InputRecorder
+            self.recorder = InputRecorder(self.sim)
 
-            # Communicate with joystick
-            self.joystick.open()
+        self.build_balloon_layer()
 
-            # Map joysticks functions to local functions
-            self.joystick.on_joybutton_press = self.on_joybutton_press
-            self.joystick.on_joybutton_release = self.on_joybutton_release
-            self.joystick.on_joyaxis_motion = self.on_joyaxis_motion
-            self.joystick.on_joyhat_motion = self.on_joyhat_motion
+        self.shown_score = None
+        self.shown_lives = None
+        self.frames = 0
 
-        else:
-            print("No joysticks found")
-            self.joystick = None
+        # Keys held in the last game are forgotten
+        self.input.clear()
+        self.timestep.reset()
+        self.interpolator.capture([])
+        self.previous_row_x = []
+        self.viewport.set_playfield(self.sim.width, self.sim.height)
+        self.follow_camera(snap=True)
 
         # Set the background color
         arcade.set_background_color(arcade.color.AMAZON)
 
-        self.spawn_acrobat()
-
     def on_draw(self):
         """
         Render the screen.
         """
 
+        t = profiler.now()
+
         # Clear screen so we can draw new stuff
         self.clear()
 
-        # Draw the player shot
-        self.acrobats.draw()
-
-        self.walls.draw()
-
-        for row in self.balloon_rows:
-            row.draw()
-
-        # Draw the player sprite
-        self.player_sprite.draw()
-        self.player_sprite.passanger.draw()
-
-        for e in  self.burst_emitters:
-            e.draw()
-
-        # Draw players score on screen
-        arcade.draw_text(
-            f"SCORE: {self.player_score}",  # Text to show
-            10,  # X position
-            SCREEN_HEIGHT - 20,  # Y positon
-            arcade.color.WHITE,  # Color of text
-        )
+        # Draw the moving sprites part of the way to the next tick
+        alpha = self.timestep.alpha
+        self.interpolator.apply(self.get_moving_sprites(), alpha)
+
+        self.follow_camera()
+        self.camera.use()
+
+        # Draw the acrobats
+        self.sim.acrobats.draw()
+
+        self.sim.walls.draw()
+
+        # Balloon sprites are only moved when they are drawn, and
+        # only if they are on screen
+        rows = self.sim.balloon_rows
+        interpolate = len(self.previous_row_x) == len(rows)
+        x_range = self.viewport.get_x_range()
+        visible_rows = []
+        for i, row in enumerate(rows):
+            if not self.viewport.shows_y(row.center_y, row.center_y):
+                continue
+            visible_rows.append(i)
+            x = None
+            if interpolate:
+                x0, x1 = self.previous_row_x[i], row.body.position.x
+                x = x0 + (x1 - x0) * alpha
+            row.sync_sprites(x, x_range)
+
+        # Rows off screen are left out of the layer. It only changes
+        # when the camera brings a row on or off screen.
+        if visible_rows != self.visible_rows:
+            self.build_balloon_layer(visible_rows)
+        self.balloon_layer.draw()
+
+        # Draw the player sprite and the passanger
+        self.player_layer.draw()
+
+        self.particles.draw()
+
+        # Back to where the game has them
+        self.interpolator.restore()
+
+        self.gui_camera.use()
+
+        # Draw players score and lives on screen
+        self.update_hud()
+        self.score_text.draw()
+        self.lives_text.draw()
+
+        if self.show_profiler:
+            self.draw_profiler()
+
+        profiler.lap("draw", t)
+
+        # Time from the key press starting the game to its first frame
+        if self.start_time is not None:
+            seconds = time.perf_counter() - self.start_time
+            self.start_time = None
+            profiler.record("start_game", seconds)
+            log.info("game", "Key press to first frame %.1f ms", seconds * 1000)
+
+    def draw_profiler(self):
+        """
+        Draw the rolling timings of the frame phases
+        """
+        # Only lay out the text now and then
+        if self.frames % PROFILER_OVERLAY_INTERVAL == 0 or not self.profiler_texts:
+            lines = ["phase             p50 ms   p95 ms   p99 ms"]
+            for phase, p50, p95, p99 in profiler.report():
+                lines.append(f"{phase:<16}{p50:>8.3f}{p95:>9.3f}{p99:>9.3f}")
+
+            # Sprites ticked in the last frame
+            active = {
+                **self.sim.scheduler.sizes,
+                "particles": len(self.particles),
+                "sleeping rows": self.sim.sleeping_rows,
+            }
+            lines.append("active  " + "  ".join(f"{group} {size}" for group, size in active.items()))
+
+            # Acrobats reused and built since the Simulation was built
+            pool = self.sim.acrobat_pool.stats
+            lines.append("pool    " + "  ".join(f"{name} {value}" for name, value in pool.items()))
+
+            self.profiler_texts = [
+                arcade.Text(
+                    line,
+                    10,
+                    SCREEN_HEIGHT - 50 - i * 16,
+                    arcade.color.WHITE,
+                    font_size=10,
+                    font_name="Courier New",
+                )
+                for i, line in enumerate(lines)
+            ]
 
-        # Draw players score on screen
-        arcade.draw_text(
-            f"LIVES: {self.player_sprite.lives}",  # Text to show
-            10 * 10,  # X position
-            SCREEN_HEIGHT - 20,  # Y positon
-            arcade.color.WHITE,  # Color of text
-        )
+        for text in self.profiler_texts:
+            text.draw()
 
-    def add_player_sprite_to_engine(self):
-        self.physics_engine.add_sprite(
-            self.player_sprite,
-            body_type=arcade.PymunkPhysicsEngine.KINEMATIC,
-            collision_type="seesaw",
-            gravity=(0,0),
-            elasticity=1.0,
-            #mass=LARGE_MASS
-        )
-    
-    def flip_player(self):
-        self.physics_engine.remove_sprite(self.player_sprite)
-        self.player_sprite.flip()
-        self.add_player_sprite_to_engine()
-
-    def spawn_acrobat(self, position=None,velocity=None,angular_velocity=0.0):
-
-        # Spawn on platforms by default
-        if position is None and velocity is None:
-            # Position and velocity to use when
-            # launching from platforms
-            p_x, p_y, v_x, v_y = random.choice(
-                [(50, 250, 200, 500),
-                (SCREEN_WIDTH - 50 ,250, -200, 500)]
-            )
-        else:
-            p_x, p_y = position
-            v_x, v_y = velocity
-
-        # Create the new acrobat sprite
-        a = Acrobat(
-            center_x=p_x,
-            center_y=p_y,
-            scale=SPRITE_SCALING,
-        )
+    def update_hud(self):
+        """
+        Change the score and lives texts, only if the values have changed
+        """
+        if self.sim.player_score != self.shown_score:
+            self.shown_score = self.sim.player_score
+            self.score_text.text = f"SCORE: {self.shown_score}"
 
-        self.physics_engine.add_sprite(
-            sprite=a,
-            mass=1,
-            gravity=(0,-300),
-            # friction=0.0,
-            collision_type="acrobat",
-            elasticity=1.0,
-            moment_of_inertia=40000.0 # math.inf, # Can not spin
-        )
+        if self.sim.player_lives != self.shown_lives:
+            self.shown_lives = self.sim.player_lives
+            self.lives_text.text = f"LIVES: {self.shown_lives}"
 
-        self.physics_engine.set_velocity(a, (v_x, v_y))
-        
-        if angular_velocity != 0.0:
-            po = self.physics_engine.get_physics_object(a)
-            po.body.angular_velocity = angular_velocity
+    def follow_camera(self, snap=False):
+        """
+        Keep the seesaw and the lowest acrobat on screen
+        """
+        player = self.sim.player_sprite
+        y = min((a.center_y for a in self.sim.acrobats), default=player.center_y)
+        self.viewport.follow(player.center_x, y, snap)
+        self.camera.move_to((self.viewport.left, self.viewport.bottom))
 
-        # Add the new shot to the list of shots (so we can draw the sprites)
-        self.acrobats.append(a)
+    def get_moving_sprites(self):
+        """
+        Return the sprites drawn between ticks
+        """
+        player = self.sim.player_sprite
+        return [*self.sim.acrobats, player, player.passanger]
 
     def on_update(self, delta_time):
         """
         Movement and game logic
         """
-        for e in self.burst_emitters:
-            e.update()
-
-            if e.can_reap():
-                self.burst_emitters.remove(e)
-
-        # Shots reflect on left, right & top. Removed bottom.
-        for a in self.acrobats:
-            # Get the physics object for the sprite
-            physics_object = self.physics_engine.get_physics_object(a)
-            # Get the current sprite velocity
-            velocity_x, velocity_y = physics_object.body.velocity
-            # Bounce x
-            if a.center_x > SCREEN_WIDTH or a.center_x < 0:
-                self.physics_engine.set_velocity(a, (velocity_x * -1, velocity_y))
-
-        # Calculate player speed 
-        player_speed_x = 0
-        if self.left_pressed and not self.right_pressed:
-            player_speed_x -= PLAYER_SPEED_X
-        elif self.right_pressed and not self.left_pressed:
-            player_speed_x += PLAYER_SPEED_X
-        
-        # Reposition the player sprite via the physics engine
-        self.physics_engine.set_position(
-            self.player_sprite,
-            (self.player_sprite.center_x + player_speed_x, self.player_sprite.center_y)
-        )
-
-        # Passanger follows sprite
-        self.player_sprite.update()
-
-        # Move player with joystick if present
-        # if self.joystick:
-        #    self.player.change_x = round(self.joystick.x) * PLAYER_SPEED_X
-
-        # Update all sprites via the Physics engine
-        self.physics_engine.step()
-
-        # Wrap balloons when off screen
-        for i, row in enumerate(self.balloon_rows):
-            # print(f"Length of balloon row {i}:", len(row))
-           for b in row:
-               b.update()
-               # get potential new position from balloon
-               new_pos = b.get_wrap_pos()
-               if new_pos is not None:
-                   self.physics_engine.set_position(b, new_pos)
-
-        # End game if no balloons are left
-        if self.no_of_ballons <= 0:
-            # FIXME: A next level should be loaded here
-            self.game_over()
-
-        # Player has no lives
-        if self.player_sprite.lives <= 0:
-            self.game_over()
+        self.frames += 1
+        t = profiler.now()
+
+        self.particles.update(delta_time)
+        t = profiler.lap("particles", t)
+
+        # Run as many ticks as fit in the time since the last frame
+        step = self.recorder.step if self.recorder else self.sim.step
+        for _ in range(self.timestep.advance(delta_time)):
+            self.interpolator.capture(self.get_moving_sprites())
+            self.previous_row_x = [row.body.position.x for row in self.sim.balloon_rows]
+
+            # Move the game one tick forward
+            step(*self.input.poll())
+            t = profiler.now()
+
+            self.show_events()
+
+            # End game if no lives are left or the last level is cleared
+            if self.sim.is_over:
+                self.game_over()
+                profiler.lap("game_over", t)
+                break
+            profiler.lap("game_over", t)
+
+    def show_events(self):
+        """
+        Show bursts from the last tick
+        """
+        for event in self.sim.events:
+            if isinstance(event, BalloonPopped):
+                sprite, position = event.balloon, event.position
+            elif isinstance(event, LifeLost):
+                sprite, position = event.acrobat, event.position
+            elif isinstance(event, LevelLoaded):
+                self.rebuild_layers()
+                continue
+            else:
+                continue
+            self.add_emitter(
+                scale=sprite.scale/2,
+                texture=sprite.texture,
+                position=position,
+            )
 
     def game_over(self):
         """
         Call this when the game is over
         """
 
-        # Create a game over view
-        game_over_view = GameOverView(score=self.player_score)
+        if self.recorder:
+            self.recorder.save(RECORDING_FILE)
+
+        # Written to disk by a background thread
+        high_scores.add(
+            PLAYER_NAME,
+            self.sim.player_score,
+            level=self.sim.level_number,
+            ticks=self.sim.ticks,
+            seed=self.sim.seed,
+        )
+
+        # Create a game over view. It hands this view back to the
+        # intro view, so the next game can reuse it.
+        game_over_view = GameOverView(score=self.sim.player_score, game_view=self)
 
         # Change to game over view
         self.window.show_view(game_over_view)
@@ -559,46 +436,17 @@ class GameView(arcade.View):
         if key == arcade.key.ESCAPE:
             self.game_over()
 
-        # Track state of arrow keys
-        if key == arcade.key.UP:
-            self.up_pressed = True
-        elif key == arcade.key.DOWN:
-            self.down_pressed = True
-        elif key == arcade.key.LEFT:
-            self.left_pressed = True
-        elif key == arcade.key.RIGHT:
-            self.right_pressed = True
+        if key == PROFILER_OVERLAY_KEY and DEBUG_ENABLED:
+            self.show_profiler = not self.show_profiler
 
-        if key == FIRE_KEY:
-            self.flip_player()
+        # Keys moving the seesaw are used on the next tick
+        self.input.on_key_press(key, modifiers)
 
     def on_key_release(self, key, modifiers):
         """
         Called whenever a key is released.
         """
-
-        if key == arcade.key.UP:
-            self.up_pressed = False
-        elif key == arcade.key.DOWN:
-            self.down_pressed = False
-        elif key == arcade.key.LEFT:
-            self.left_pressed = False
-        elif key == arcade.key.RIGHT:
-            self.right_pressed = False
-
-    def on_joybutton_press(self, joystick, button_no):
-        print("Button pressed:", button_no)
-        # Press the fire key
-        self.on_key_press(FIRE_KEY, [])
-
-    def on_joybutton_release(self, joystick, button_no):
-        print("Button released:", button_no)
-
-    def on_joyaxis_motion(self, joystick, axis, value):
-        print("Joystick axis {}, value {}".format(axis, value))
-
-    def on_joyhat_motion(self, joystick, hat_x, hat_y):
-        print("Joystick hat ({}, {})".format(hat_x, hat_y))
+        self.input.on_key_release(key, modifiers)
 
 
 class IntroView(arcade.View):
@@ -606,10 +454,25 @@ class IntroView(arcade.View):
     View to show instructions
     """
 
+    def __init__(self, game_view=None, window=None):
+        """
+        Create an intro view. Pass the GameView of the last game to reuse it.
+        """
+        self.game_view = game_view
+
+        super().__init__(window)
+
     def on_show_view(self):
         """
         This is run once when we switch to this view
         """
+        joystick_watcher.set_scanning(True)
+        self.frames = 0
+
+        # Work left over by a fast launch, done one step per frame
+        self.warm_steps = []
+        if FAST_LAUNCH and self.game_view is None:
+            self.warm_steps = [self.prepare_assets, self.prepare_game_view]
 
         # Set the background color
         arcade.set_background_color(arcade.csscolor.DARK_SLATE_BLUE)
@@ -618,38 +481,77 @@ class IntroView(arcade.View):
         # to reset the viewport back to the start so we can see what we draw.
         arcade.set_viewport(0, self.window.width, 0, self.window.height)
 
+        # The text never changes, so it is only laid out once
+        self.texts = [
+            arcade.Text(
+                "Instructions Screen",
+                self.window.width / 2,
+                self.window.height / 2,
+                arcade.color.WHITE,
+                font_size=50,
+                anchor_x="center",
+            ),
+            arcade.Text(
+                "Press any key to start the game",
+                self.window.width / 2,
+                self.window.height / 2 - 75,
+                arcade.color.WHITE,
+                font_size=20,
+                anchor_x="center",
+            ),
+        ]
+
     def on_draw(self):
         """
         Draw this view
         """
         self.clear()
 
-        # Draw some text
-        arcade.draw_text(
-            "Instructions Screen",
-            self.window.width / 2,
-            self.window.height / 2,
-            arcade.color.WHITE,
-            font_size=50,
-            anchor_x="center",
-        )
+        for text in self.texts:
+            text.draw()
 
-        # Draw more text
-        arcade.draw_text(
-            "Press any key to start the game",
-            self.window.width / 2,
-            self.window.height / 2 - 75,
-            arcade.color.WHITE,
-            font_size=20,
-            anchor_x="center",
-        )
+        self.frames += 1
+        if self.frames == 1:
+            startup_trace.mark("first_intro_frame")
+
+    def on_update(self, delta_time):
+        """
+        Warm the caches while the intro is shown
+        """
+        # The intro is drawn before any warming starts
+        if self.frames and self.warm_steps:
+            step = self.warm_steps.pop(0)
+            step()
+            startup_trace.mark(step.__name__)
+
+        # Report the startup once it is all done
+        if self.frames and not self.warm_steps and startup_trace.enabled:
+            startup_trace.stop()
+            for line in startup_trace.report():
+                log.info("startup", "%s", line)
+
+    def prepare_assets(self):
+        """
+        Build all textures and upload them to the GPU once
+        """
+        prepare_assets(self.window)
+
+    def prepare_game_view(self):
+        """
+        Build the game, so starting it only resets it
+        """
+        if self.game_view is None:
+            self.game_view = GameView()
+            self.game_view.setup()
 
     def on_key_press(self, key: int, modifiers: int):
         """
         Start the game when any key is pressed
         """
-        game_view = GameView()
-        self.window.show_view(game_view)
+        if self.game_view is None:
+            self.game_view = GameView()
+        self.game_view.start_time = time.perf_counter()
+        self.window.show_view(self.game_view)
 
 
 class GameOverView(arcade.View):
@@ -657,11 +559,13 @@ class GameOverView(arcade.View):
     View to show when the game is over
     """
 
-    def __init__(self, score, window=None):
+    def __init__(self, score, game_view=None, window=None):
         """
-        Create a Gaome Over view. Pass the final score to display.
+        Create a Gaome Over view. Pass the final score to display,
+        and the GameView to reuse for the next game.
         """
         self.score = score
+        self.game_view = game_view
 
         super().__init__(window)
 
@@ -675,6 +579,7 @@ class GameOverView(arcade.View):
         """
         This is run once when we switch to this view
         """
+        joystick_watcher.set_scanning(True)
 
         # Set the background color
         arcade.set_background_color(arcade.csscolor.DARK_GOLDENROD)
@@ -683,6 +588,47 @@ class GameOverView(arcade.View):
         # to reset the viewport back to the start so we can see what we draw.
         arcade.set_viewport(0, self.window.width, 0, self.window.height)
 
+        # The text never changes, so it is only laid out once
+        self.texts = [
+            arcade.Text(
+                "Game over!",
+                self.window.width / 2,
+                self.window.height / 2,
+                arcade.color.WHITE,
+                font_size=50,
+                anchor_x="center",
+            ),
+            # Player's score
+            arcade.Text(
+                f"Your score: {self.score}",
+                self.window.width / 2,
+                self.window.height / 2 - 75,
+                arcade.color.WHITE,
+                font_size=20,
+                anchor_x="center",
+            ),
+        ]
+
+        # The best scores, including this game's, and the player's own best
+        lines = ["High scores"]
+        for i, s in enumerate(high_scores.top(HIGH_SCORES_SHOWN)):
+            lines.append(f"{i + 1}. {s.player:<12} {s.score:>6}")
+        best = high_scores.player_top(PLAYER_NAME, 1)
+        if best:
+            lines.append(f"Your best: {best[0].score}")
+        for i, line in enumerate(lines):
+            self.texts.append(
+                arcade.Text(
+                    line,
+                    self.window.width / 2,
+                    self.window.height / 2 + 220 - i * 22,
+                    arcade.color.WHITE,
+                    font_size=14,
+                    anchor_x="center",
+                    font_name="Courier New",
+                )
+            )
+
     def on_draw(self):
         """
         Draw this view
@@ -690,40 +636,55 @@ class GameOverView(arcade.View):
 
         self.clear()
 
-        # Draw some text
-        arcade.draw_text(
-            "Game over!",
-            self.window.width / 2,
-            self.window.height / 2,
-            arcade.color.WHITE,
-            font_size=50,
-            anchor_x="center",
-        )
-
-        # Draw player's score
-        arcade.draw_text(
-            f"Your score: {self.score}",
-            self.window.width / 2,
-            self.window.height / 2 - 75,
-            arcade.color.WHITE,
-            font_size=20,
-            anchor_x="center",
-        )
+        for text in self.texts:
+            text.draw()
 
     def on_key_press(self, key: int, modifiers: int):
         """
         Return to intro screen when any key is pressed
         """
-        intro_view = IntroView()
+        intro_view = IntroView(game_view=self.game_view)
         self.window.show_view(intro_view)
 
 
+def prepare_assets(window):
+    """
+    Build all textures and upload them to the GPU once
+    """
+    preload_textures()
+    texture_registry.pack(window.ctx.default_atlas)
+
+
 def main():
     """
     Main method
     """
+    startup_trace.mark("imports")
+
     # Create a window to hold views
     window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT)
+    startup_trace.mark("window")
+
+    # A fast launch prepares the assets while the intro is shown
+    if not FAST_LAUNCH:
+        prepare_assets(window)
+        startup_trace.mark("prepare_assets")
+
+    # Save the frame timings when the game is closed
+    if DEBUG_ENABLED:
+        atexit.register(profiler.dump_csv, PROFILE_CSV)
+        log.default_level = DEBUG
+
+    # Write log messages from a background thread
+    log.start(LOG_FILE)
+    atexit.register(log.stop)
+
+    # High scores are written from a background thread too
+    high_scores.start(SCORES_FILE)
+    atexit.register(high_scores.stop)
+
+    # Look for a joystick now, and later if none is plugged in
+    joystick_watcher.start()
 
     # Game starts in the intro view
     start_view = IntroView()
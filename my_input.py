@@ -0,0 +1,228 @@
+"""
+Input from the keyboard and joysticks.
+
+Window and joystick callbacks fire once per OS event, however many
+events the device sends. InputQueue only buffers them, and poll()
+applies them all once per simulation tick to make a single InputState.
+The analog stick goes through a deadzone and a response curve and is
+rounded to MOVE_STEPS steps, so a recording can store it exactly.
+
+JoystickWatcher finds joysticks once at startup and looks again every
+JOYSTICK_SCAN_INTERVAL seconds while none is connected, so plugging in a
+joystick works without scanning the devices on every view show. Scanning
+opens every input device, so it is not done while a joystick is in use,
+nor during play: the views between games turn scanning on and the game
+views turn it off.
+A joystick that is unplugged closes when reading it fails. The watcher
+then forgets it and looks for one again, so plugging it back in works.
+"""
+
+from collections import deque
+from typing import NamedTuple
+
+import arcade
+
+from my_simulation import MOVE_STEPS
+from my_log import log
+
+# Keys moving the seesaw and flipping it
+LEFT_KEY = arcade.key.LEFT
+RIGHT_KEY = arcade.key.RIGHT
+FIRE_KEY = arcade.key.SPACE
+
+# Stick positions closer to the center than this count as centered
+AXIS_DEADZONE = 0.15
+
+# Exponent of the response curve. Above 1 gives finer control near the center.
+AXIS_CURVE = 2.0
+
+# Seconds between looking for a joystick while none is connected
+JOYSTICK_SCAN_INTERVAL = 2.0
+
+
+class InputState(NamedTuple):
+    left: bool
+    right: bool
+    flip: bool
+    # Analog movement from -1 (full left) to 1 (full right)
+    move: float
+
+
+def apply_response_curve(value, deadzone=AXIS_DEADZONE, curve=AXIS_CURVE):
+    """
+    Return an axis value with the deadzone cut out and the response curve applied,
+    rounded to MOVE_STEPS steps
+    """
+    magnitude = abs(value)
+    if magnitude <= deadzone:
+        return 0.0
+
+    # Rescale, so the stick starts moving from 0 just outside the deadzone
+    magnitude = min((magnitude - deadzone) / (1.0 - deadzone), 1.0) ** curve
+    steps = round(magnitude * MOVE_STEPS)
+    return (steps if value > 0 else -steps) / MOVE_STEPS
+
+
+class InputQueue:
+    """
+    Buffers key, button, axis and hat events and turns them into one InputState per tick
+    """
+
+    def __init__(self, deadzone=AXIS_DEADZONE, curve=AXIS_CURVE):
+        self.deadzone = deadzone
+        self.curve = curve
+
+        # (handler, arguments) for every event since the last poll
+        self.events = deque()
+
+        # State held between ticks
+        self.keys = set()
+        self.hat_x = 0
+        self.axis_x = 0.0
+
+        # Keys pressed since the start of the last poll
+        self.pressed = set()
+
+    def clear(self):
+        """
+        Forget all events and held keys
+        """
+        self.events.clear()
+        self.keys.clear()
+        self.hat_x = 0
+        self.axis_x = 0.0
+
+    # Window and joystick event handlers. These only queue the event.
+
+    def on_key_press(self, key, modifiers):
+        self.events.append((self.key_down, key))
+
+    def on_key_release(self, key, modifiers):
+        self.events.append((self.key_up, key))
+
+    def on_joybutton_press(self, joystick, button):
+        self.events.append((self.key_down, FIRE_KEY))
+
+    def on_joybutton_release(self, joystick, button):
+        self.events.append((self.key_up, FIRE_KEY))
+
+    def on_joyaxis_motion(self, joystick, axis, value):
+        if axis == "x":
+            self.events.append((self.set_axis_x, value))
+
+    def on_joyhat_motion(self, joystick, hat_x, hat_y):
+        self.events.append((self.set_hat_x, hat_x))
+
+    # Applied in poll()
+
+    def key_down(self, key):
+        self.keys.add(key)
+        self.pressed.add(key)
+
+    def key_up(self, key):
+        self.keys.discard(key)
+
+    def set_axis_x(self, value):
+        self.axis_x = value
+
+    def set_hat_x(self, hat_x):
+        self.hat_x = hat_x
+
+    def poll(self):
+        """
+        Apply all queued events and return the input for the next tick
+        """
+        # Keys pressed during the tick count, even if they were released again
+        self.pressed = set()
+
+        while self.events:
+            handler, value = self.events.popleft()
+            handler(value)
+
+        def held(key):
+            return key in self.keys or key in self.pressed
+
+        return InputState(
+            left=held(LEFT_KEY) or self.hat_x < 0,
+            right=held(RIGHT_KEY) or self.hat_x > 0,
+            flip=FIRE_KEY in self.pressed,
+            move=apply_response_curve(self.axis_x, self.deadzone, self.curve),
+        )
+
+
+class JoystickWatcher:
+    """
+    Keeps the first joystick open and sends its events to an InputQueue
+    """
+
+    def __init__(self, scan_interval=JOYSTICK_SCAN_INTERVAL):
+        self.scan_interval = scan_interval
+        self.joystick = None
+        self.target = None
+
+        # False while a game is played, so scans never stall a frame
+        self.scanning = True
+
+    def start(self):
+        """
+        Look for a joystick now and then every scan_interval seconds while none is connected
+        """
+        self.scan()
+        arcade.schedule(self.on_scan, self.scan_interval)
+
+    def attach(self, target):
+        """
+        Send joystick events to target, an InputQueue
+        """
+        if self.joystick is not None:
+            if self.target is not None:
+                self.joystick.remove_handlers(self.target)
+            self.joystick.push_handlers(target)
+        self.target = target
+
+    def set_scanning(self, scanning):
+        """
+        Allow or stop looking for a joystick. An unplugged joystick is
+        still noticed while scanning is stopped.
+        """
+        self.scanning = scanning
+
+    def on_scan(self, delta_time):
+        if self.joystick is not None and not self.joystick.device.is_open:
+            self.disconnect()
+        if self.joystick is None and self.scanning:
+            self.scan()
+
+    def disconnect(self):
+        """
+        Forget the joystick after it was unplugged
+        """
+        log.info("input", "Joystick disconnected")
+        joystick = self.joystick
+        if self.target is not None:
+            joystick.remove_handlers(self.target)
+
+            # Center the stick, so the seesaw does not keep moving
+            self.target.on_joyaxis_motion(joystick, "x", 0.0)
+            self.target.on_joyhat_motion(joystick, 0, 0)
+            self.target.on_joybutton_release(joystick, 0)
+        self.joystick = None
+
+    def scan(self):
+        """
+        Open the first joystick, if there is one
+        """
+        joysticks = arcade.get_joysticks()
+        if not joysticks:
+            return
+
+        log.info("input", "Found %d joystick(s)", len(joysticks))
+        joystick = joysticks[0]
+        joystick.open()
+        if self.target is not None:
+            joystick.push_handlers(self.target)
+        self.joystick = joystick
+
+
+# Watches for joysticks for the whole game
+joystick_watcher = JoystickWatcher()
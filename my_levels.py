@@ -0,0 +1,289 @@
+"""
+Levels of the game.
+
+A level is a JSON file in the levels directory, levels/level_<n>.json:
+
+    {
+        "width": 800,
+        "height": 600,
+        "walls": [{"x": 40, "y": 200, "width": 80, "height": 30}],
+        "spawn_points": [{"x": 50, "y": 250, "change_x": 200, "change_y": 500}],
+        "balloon_rows": [
+            {"y": 570, "cols": 10, "color": [161, 202, 241], "speed": -20, "size": 30}
+        ]
+    }
+
+Walls may also have a "color". A level is compiled into a Level with the
+position of every balloon and the vertices of every shape worked out,
+and the compiled level is cached in levels/.cache, so the JSON is only
+parsed again when it changes. LevelLoader compiles the next level and
+builds its textures on a background thread while the current level is
+played.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+import arcade
+
+from my_textures import texture_registry
+
+LEVELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels")
+CACHE_DIR = os.path.join(LEVELS_DIR, ".cache")
+
+# Changing the compiled layout must change this, so old caches are not used
+CACHE_VERSION = 1
+
+WALL_COLOR = arcade.color.PERSIAN_INDIGO
+
+
+class WallData(NamedTuple):
+    center_x: float
+    center_y: float
+    width: float
+    height: float
+    color: tuple
+    # Hit box relative to the center
+    vertices: tuple
+
+
+class BalloonRowData(NamedTuple):
+    center_y: float
+    size: int
+    color: tuple
+    speed: float
+    # Balloons wrap when they pass these
+    min_x: float
+    max_x: float
+    # Start x of every balloon in the row
+    xs: tuple
+    # Hit box of a balloon relative to its center
+    vertices: tuple
+
+
+class SpawnPoint(NamedTuple):
+    center_x: float
+    center_y: float
+    change_x: float
+    change_y: float
+
+
+class Level(NamedTuple):
+    number: int
+    width: int
+    height: int
+    walls: tuple
+    balloon_rows: tuple
+    spawn_points: tuple
+
+    @property
+    def balloon_count(self):
+        return sum(len(row.xs) for row in self.balloon_rows)
+
+
+def get_box(width, height):
+    """
+    Return the vertices of a box centered on (0, 0)
+    """
+    w, h = width / 2, height / 2
+    return ((-w, -h), (w, -h), (w, h), (-w, h))
+
+
+def get_balloon_row(center_y, cols, color, speed, size, width):
+    """
+    Return a row of cols evenly spaced balloons wrapping just off screen
+    """
+    # The space between ballons
+    spacing = round((width + 2 * size) / cols)
+
+    return BalloonRowData(
+        center_y=center_y,
+        size=size,
+        color=tuple(color),
+        speed=speed,
+        min_x=-1 * size,
+        max_x=width + size,
+        xs=tuple(col * spacing for col in range(cols)),
+        vertices=get_box(size, size),
+    )
+
+
+def compile_level(number, data):
+    """
+    Turn the JSON data of a level into a Level
+    """
+    width = data.get("width", 800)
+    height = data.get("height", 600)
+
+    walls = tuple(
+        WallData(
+            center_x=w["x"],
+            center_y=w["y"],
+            width=w["width"],
+            height=w["height"],
+            color=tuple(w.get("color", WALL_COLOR)),
+            vertices=get_box(w["width"], w["height"]),
+        )
+        for w in data.get("walls", [])
+    )
+
+    balloon_rows = tuple(
+        get_balloon_row(
+            center_y=r["y"],
+            cols=r["cols"],
+            color=r["color"],
+            speed=r["speed"],
+            size=r.get("size", 30),
+            width=width,
+        )
+        for r in data["balloon_rows"]
+    )
+
+    spawn_points = tuple(
+        SpawnPoint(p["x"], p["y"], p["change_x"], p["change_y"])
+        for p in data["spawn_points"]
+    )
+
+    return Level(number, width, height, walls, balloon_rows, spawn_points)
+
+
+def generate_level(rows, cols, speed, size=30, width=800, height=600):
+    """
+    Return the classic layout: two platforms and rows of balloons
+    in alternating colors and directions
+    """
+    # Balloon rows will alternate between these colors
+    colors = [
+        arcade.color.BABY_BLUE_EYES,
+        arcade.color.PINK,
+        arcade.color.GREEN_YELLOW,
+    ]
+    spacing = round((width + 2 * size) / cols)
+
+    pw = 80 # Platform width
+    ph = 30 # Platform height
+    py = 200
+
+    return compile_level(0, {
+        "width": width,
+        "height": height,
+        "walls": [
+            {"x": pw / 2, "y": py, "width": pw, "height": ph}, # Left
+            {"x": width - pw / 2, "y": py, "width": pw, "height": ph}, # Right
+        ],
+        "spawn_points": [
+            {"x": 50, "y": 250, "change_x": 200, "change_y": 500},
+            {"x": width - 50, "y": 250, "change_x": -200, "change_y": 500},
+        ],
+        "balloon_rows": [
+            {
+                "y": height - size - row * spacing,
+                "cols": cols,
+                "color": colors[row % len(colors)],
+                # Flip direction for every other row
+                "speed": speed * (-1) ** row,
+                "size": size,
+            }
+            for row in range(rows)
+        ],
+    })
+
+
+def get_level_file(number):
+    return os.path.join(LEVELS_DIR, f"level_{number}.json")
+
+
+def has_level(number):
+    """
+    True if there is a file for the level
+    """
+    return os.path.exists(get_level_file(number))
+
+
+def load_level(number):
+    """
+    Return a compiled level, from the cache if the level file has not changed
+    """
+    if not has_level(number):
+        raise Exception(f"Unsupported level {number}")
+
+    with open(get_level_file(number), "rb") as f:
+        source = f.read()
+    source_hash = hashlib.sha1(source).hexdigest()
+
+    cache_file = os.path.join(CACHE_DIR, f"level_{number}.bin")
+    try:
+        with open(cache_file, "rb") as f:
+            version, cached_hash, level = pickle.load(f)
+        if version == CACHE_VERSION and cached_hash == source_hash:
+            return level
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError):
+        pass
+
+    level = compile_level(number, json.loads(source))
+
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cache_file, "wb") as f:
+            pickle.dump((CACHE_VERSION, source_hash, level), f)
+    except OSError:
+        # A read only install can still play, just without a cache
+        pass
+
+    return level
+
+
+def prepare_textures(level):
+    """
+    Build the textures of a level's balloons and walls
+    """
+    for row in level.balloon_rows:
+        texture_registry.get("balloon", (row.size, row.size), row.color)
+    for wall in level.walls:
+        texture_registry.get("wall", (wall.width, wall.height), wall.color)
+
+
+def prepare_level(number):
+    """
+    Load a level and build its textures
+    """
+    level = load_level(number)
+    prepare_textures(level)
+    return level
+
+
+class LevelLoader:
+    """
+    Loads levels on a background thread and keeps them once loaded
+    """
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="LevelLoader")
+
+        # Future of every level asked for
+        self.levels = {}
+
+    def preload(self, number):
+        """
+        Start loading a level in the background, if there is one
+        """
+        if number not in self.levels and has_level(number):
+            self.levels[number] = self.executor.submit(prepare_level, number)
+
+    def get(self, number):
+        """
+        Return a level, waiting for it if it is still loading
+        """
+        if number not in self.levels:
+            if not has_level(number):
+                raise Exception(f"Unsupported level {number}")
+            self.levels[number] = self.executor.submit(prepare_level, number)
+        return self.levels[number].result()
+
+
+# The loader used by the game
+level_loader = LevelLoader()
@@ -0,0 +1,137 @@
+"""
+Logging that never blocks the game.
+
+Collision handlers and input callbacks only push a small record
+(time, level, category, format, args) into a ring buffer. A background
+thread formats the records and writes them in batches to a file or to
+stdout. Each category has its own level, and records below it are
+dropped before anything is built.
+
+    from my_log import log
+    log.debug("seesaw", "Speed modifier %.2f", a_speed_modifier)
+"""
+
+import sys
+import threading
+import time
+from collections import deque
+from logging import DEBUG, INFO, WARNING, ERROR, getLevelName
+
+# Records kept in memory waiting to be written. When the buffer
+# is full the oldest records are dropped.
+LOG_BUFFER_SIZE = 10000
+
+# Seconds between writes
+LOG_FLUSH_INTERVAL = 0.25
+
+
+class GameLog:
+    """
+    A ring buffer of log records written by a background thread
+    """
+
+    def __init__(self, buffer_size=LOG_BUFFER_SIZE, default_level=INFO):
+        self.records = deque(maxlen=buffer_size)
+        self.default_level = default_level
+
+        # Level of each category, categories not here use default_level
+        self.levels = {}
+
+        # Number of records lost because the buffer was full
+        self.dropped = 0
+
+        self.stream = None
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def set_level(self, category, level):
+        """
+        Set the lowest level logged for a category
+        """
+        self.levels[category] = level
+
+    def log(self, level, category, message, *args):
+        """
+        Add a record. Formatting is done later by the writer thread.
+        """
+        if level < self.levels.get(category, self.default_level):
+            return
+        if len(self.records) == self.records.maxlen:
+            self.dropped += 1
+        self.records.append((time.time(), level, category, message, args))
+
+    def debug(self, category, message, *args):
+        self.log(DEBUG, category, message, *args)
+
+    def info(self, category, message, *args):
+        self.log(INFO, category, message, *args)
+
+    def warning(self, category, message, *args):
+        self.log(WARNING, category, message, *args)
+
+    def error(self, category, message, *args):
+        self.log(ERROR, category, message, *args)
+
+    def start(self, filename=None, flush_interval=LOG_FLUSH_INTERVAL):
+        """
+        Start writing records to a file, or to stdout if no filename is given
+        """
+        if self.thread is not None:
+            return
+
+        self.stream = open(filename, "a") if filename else sys.stdout
+        self.stopping.clear()
+        self.thread = threading.Thread(
+            target=self.run, args=(flush_interval,), name="GameLog", daemon=True
+        )
+        self.thread.start()
+
+    def run(self, flush_interval):
+        """
+        The writer thread
+        """
+        while not self.stopping.wait(flush_interval):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        """
+        Format and write all records in the buffer
+        """
+        lines = []
+        records = self.records
+        while records:
+            created, level, category, message, args = records.popleft()
+            if args:
+                try:
+                    message = message % args
+                except (TypeError, ValueError):
+                    message = f"{message} {args}"
+            lines.append(
+                f"{time.strftime('%H:%M:%S', time.localtime(created))}"
+                f".{int(created * 1000) % 1000:03d} "
+                f"{getLevelName(level):<7} {category}: {message}\n"
+            )
+
+        if lines and self.stream is not None:
+            self.stream.write("".join(lines))
+            self.stream.flush()
+
+    def stop(self):
+        """
+        Write the remaining records and stop the writer thread
+        """
+        if self.thread is None:
+            return
+
+        self.stopping.set()
+        self.thread.join()
+        self.thread = None
+
+        if self.stream is not sys.stdout:
+            self.stream.close()
+        self.stream = None
+
+
+# The log used by the whole game
+log = GameLog()
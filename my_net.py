@@ -0,0 +1,347 @@
+"""
+Network protocol for two-player games.
+
+A match is two players, each playing their own game with the same seed
+and level on the server, racing for the higher score. The server in
+my_server.py runs the games and the clients in my_client.py send their
+inputs and draw what the server sends back.
+
+Clients send every tick's input, numbered, together with all inputs the
+server has not confirmed yet, so a lost packet loses no input. The
+server sends each client the state of its game every SEND_INTERVAL
+ticks. States are quantized to integers and XORed with the last state
+the client acknowledged, which is mostly zeros, then compressed. When
+the client has no state the server still remembers, a whole state is
+sent instead.
+
+LossyLink delays and drops outgoing packets, so latency and packet loss
+can be tried on localhost.
+"""
+
+import heapq
+import math
+import random
+import struct
+import time
+import zlib
+from typing import NamedTuple
+
+from my_snapshot import xor_bytes
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7777
+
+MAGIC = b"CIRC"
+PROTOCOL_VERSION = 1
+
+# Largest packet the server sends or reads
+MAX_PACKET_SIZE = 8192
+
+# Bytes of IP and UDP headers added to every packet, for bandwidth reports
+UDP_OVERHEAD = 28
+
+# Ticks between states sent to a client
+SEND_INTERVAL = 2
+
+# States the server keeps per client to encode against, and the client to decode against
+STATE_HISTORY = 64
+
+# Unconfirmed inputs repeated in every input packet
+INPUT_REDUNDANCY = 16
+
+# Quantization: positions and velocities in 1/8 pixel, angles in 1/65536
+# of a turn, angular velocity in 1/1024 radians per second
+POSITION_SCALE = 8
+VELOCITY_SCALE = 8
+ANGLE_STEPS = 65536
+ANGULAR_VELOCITY_SCALE = 1024
+
+# Packet types
+PACKET_HELLO = 1
+PACKET_WAITING = 2
+PACKET_WELCOME = 3
+PACKET_INPUT = 4
+PACKET_STATE = 5
+PACKET_BYE = 6
+
+PACKET_TYPE = struct.Struct("<B")
+HELLO = struct.Struct("<B4sH")  # type, magic, version
+WELCOME = struct.Struct("<BIBbHB")  # type, token, player, level, tick rate, send interval
+INPUT = struct.Struct("<BIIIIB")  # type, token, acked tick, client time ms, newest input, inputs
+INPUT_RECORD = struct.Struct("<Bb")  # input bits, analog movement in steps
+STATE = struct.Struct("<BIIIIB")  # type, tick, baseline tick, last input, echoed time ms, flags
+BYE = struct.Struct("<BI")  # type, token
+
+# State flags
+STATE_KEYFRAME = 0b01
+
+# Quantized state: score, lives, balloons, level, flags, seesaw x,
+# opponent score, opponent lives, opponent flags, rows, acrobats
+STATE_HEADER = struct.Struct("<ibHbBiibBBB")
+STATE_ROW = struct.Struct("<iB")  # body x, columns, then the alive bits
+STATE_ACROBAT = struct.Struct("<iihhHh")  # x, y, velocity x, velocity y, angle, angular velocity
+
+# Player flags in a state
+PLAYER_LEFT_SIDE_DOWN = 0b001
+PLAYER_OVER = 0b010
+PLAYER_GONE = 0b100
+
+
+class NetState(NamedTuple):
+    """
+    A player's game as sent to the client, in world units
+    """
+    score: int
+    lives: int
+    balloons: int
+    level: object
+    left_side_down: bool
+    over: bool
+    seesaw_x: float
+    opponent_score: int
+    opponent_lives: int
+    opponent_over: bool
+    opponent_gone: bool
+    # (body x, alive bytes) of each balloon row
+    rows: list
+    # (x, y, velocity x, velocity y, angle in radians, angular velocity) of each acrobat
+    acrobats: list
+
+
+def quantize(value, scale, bits):
+    """
+    Round value to steps of 1 / scale, clamped to a signed integer of bits
+    """
+    limit = (1 << (bits - 1)) - 1
+    return max(-limit, min(round(value * scale), limit))
+
+
+def quantize_angle(angle):
+    return round(angle / math.tau * ANGLE_STEPS) % ANGLE_STEPS
+
+
+def pack_alive(alive):
+    """
+    Pack a balloon row's alive bytes into bits
+    """
+    bits = bytearray((len(alive) + 7) // 8)
+    for i, a in enumerate(alive):
+        if a:
+            bits[i >> 3] |= 1 << (i & 7)
+    return bytes(bits)
+
+
+def unpack_alive(bits, columns):
+    return bytes((bits[i >> 3] >> (i & 7)) & 1 for i in range(columns))
+
+
+def get_player_flags(sim, gone=False):
+    flags = PLAYER_LEFT_SIDE_DOWN if sim.player_sprite.left_side_down else 0
+    if sim.is_over or gone:
+        flags |= PLAYER_OVER
+    if gone:
+        flags |= PLAYER_GONE
+    return flags
+
+
+def encode_state(sim, opponent, gone=False, opponent_gone=False):
+    """
+    Return the quantized state of a player's Simulation, with the score of the opponent's
+    """
+    parts = [
+        STATE_HEADER.pack(
+            int(sim.player_score),
+            max(-128, min(int(sim.player_lives), 127)),
+            sim.no_of_ballons,
+            -1 if sim.level_number is None else sim.level_number,
+            get_player_flags(sim, gone),
+            quantize(sim.seesaw_body.position.x, POSITION_SCALE, 32),
+            int(opponent.player_score),
+            max(-128, min(int(opponent.player_lives), 127)),
+            get_player_flags(opponent, opponent_gone),
+            len(sim.balloon_rows),
+            len(sim.acrobats),
+        )
+    ]
+
+    for row in sim.balloon_rows:
+        parts.append(STATE_ROW.pack(quantize(row.body.position.x, POSITION_SCALE, 32), len(row.alive)))
+        parts.append(pack_alive(row.alive))
+
+    for a in sim.acrobats:
+        body = sim.physics_engine.get_physics_object(a).body
+        x, y = body.position
+        velocity_x, velocity_y = body.velocity
+        parts.append(STATE_ACROBAT.pack(
+            quantize(x, POSITION_SCALE, 32),
+            quantize(y, POSITION_SCALE, 32),
+            quantize(velocity_x, VELOCITY_SCALE, 16),
+            quantize(velocity_y, VELOCITY_SCALE, 16),
+            quantize_angle(body.angle),
+            quantize(body.angular_velocity, ANGULAR_VELOCITY_SCALE, 16),
+        ))
+
+    return b"".join(parts)
+
+
+def decode_state(data):
+    """
+    Return the NetState of a quantized state from encode_state()
+    """
+    (
+        score, lives, balloons, level, flags, seesaw_x,
+        opponent_score, opponent_lives, opponent_flags, row_count, acrobat_count,
+    ) = STATE_HEADER.unpack_from(data)
+    offset = STATE_HEADER.size
+
+    rows = []
+    for _ in range(row_count):
+        body_x, columns = STATE_ROW.unpack_from(data, offset)
+        offset += STATE_ROW.size
+        size = (columns + 7) // 8
+        if offset + size > len(data):
+            raise ValueError("Truncated state")
+        rows.append((body_x / POSITION_SCALE, unpack_alive(data[offset:offset + size], columns)))
+        offset += size
+
+    acrobats = []
+    for _ in range(acrobat_count):
+        x, y, velocity_x, velocity_y, angle, angular_velocity = STATE_ACROBAT.unpack_from(data, offset)
+        offset += STATE_ACROBAT.size
+        acrobats.append((
+            x / POSITION_SCALE,
+            y / POSITION_SCALE,
+            velocity_x / VELOCITY_SCALE,
+            velocity_y / VELOCITY_SCALE,
+            angle / ANGLE_STEPS * math.tau,
+            angular_velocity / ANGULAR_VELOCITY_SCALE,
+        ))
+
+    return NetState(
+        score=score,
+        lives=lives,
+        balloons=balloons,
+        level=None if level < 0 else level,
+        left_side_down=bool(flags & PLAYER_LEFT_SIDE_DOWN),
+        over=bool(flags & PLAYER_OVER),
+        seesaw_x=seesaw_x / POSITION_SCALE,
+        opponent_score=opponent_score,
+        opponent_lives=opponent_lives,
+        opponent_over=bool(opponent_flags & PLAYER_OVER),
+        opponent_gone=bool(opponent_flags & PLAYER_GONE),
+        rows=rows,
+        acrobats=acrobats,
+    )
+
+
+def compress_state(data, baseline=None):
+    """
+    Return a state compressed on its own, or against a baseline state of the same length
+    """
+    if baseline is not None and len(baseline) == len(data):
+        data = xor_bytes(data, baseline)
+
+    # States are small, so zlib's header and checksum are left out
+    compressor = zlib.compressobj(1, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress_state(payload, baseline=None):
+    """
+    Undo compress_state()
+    """
+    data = zlib.decompress(payload, -zlib.MAX_WBITS)
+    if baseline is not None:
+        if len(baseline) != len(data):
+            raise ValueError("State and baseline differ in length")
+        return xor_bytes(data, baseline)
+    return data
+
+
+def get_time_ms():
+    """
+    A millisecond clock that wraps around like the one in the packets
+    """
+    return int(time.monotonic() * 1000) & 0xFFFFFFFF
+
+
+class Traffic:
+    """
+    Bytes and packets sent and received, for bandwidth reports
+    """
+
+    def __init__(self):
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.packets_sent = 0
+        self.packets_received = 0
+        self.start = time.perf_counter()
+
+    def sent(self, size):
+        self.bytes_sent += size + UDP_OVERHEAD
+        self.packets_sent += 1
+
+    def received(self, size):
+        self.bytes_received += size + UDP_OVERHEAD
+        self.packets_received += 1
+
+    def rates(self):
+        """
+        Return kbit/s sent and received since the start, with UDP/IP headers
+        """
+        seconds = max(time.perf_counter() - self.start, 1e-9)
+        return self.bytes_sent * 8 / 1000 / seconds, self.bytes_received * 8 / 1000 / seconds
+
+
+class LossyLink:
+    """
+    Sends packets on a UDP socket after a delay, dropping some of them
+    """
+
+    def __init__(self, sock, latency=0.0, jitter=0.0, loss=0.0, seed=None):
+        """
+        latency and jitter are in seconds, loss is the fraction of packets dropped
+        """
+        self.sock = sock
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.rng = random.Random(seed)
+
+        # (time to send, order, data, address) of delayed packets
+        self.queue = []
+        self.count = 0
+        self.dropped = 0
+
+    def sendto(self, data, address):
+        if self.loss and self.rng.random() < self.loss:
+            self.dropped += 1
+            return
+        if not (self.latency or self.jitter):
+            self.sock.sendto(data, address)
+            return
+
+        delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+        self.count += 1
+        heapq.heappush(self.queue, (time.perf_counter() + delay, self.count, data, address))
+
+    def flush(self):
+        """
+        Send the delayed packets that are due
+        """
+        now = time.perf_counter()
+        queue = self.queue
+        while queue and queue[0][0] <= now:
+            _, _, data, address = heapq.heappop(queue)
+            try:
+                self.sock.sendto(data, address)
+            except OSError:
+                pass
+
+    def next_due(self):
+        """
+        Seconds until the next delayed packet is due, or None
+        """
+        if not self.queue:
+            return None
+        return max(0.0, self.queue[0][0] - time.perf_counter())
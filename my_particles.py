@@ -0,0 +1,145 @@
+"""
+Particle effects for bursts.
+
+All live particles are stored in NumPy arrays and moved with one set of
+array operations per update, instead of one Emitter with its own
+Particle sprites per burst. They are drawn from a single SpriteList with
+one sprite per particle slot. The number of slots is the particle
+budget: a burst that does not fit gets fewer particles.
+"""
+
+import arcade
+import numpy as np
+
+from my_textures import texture_registry
+
+# Most particles alive at the same time
+PARTICLE_BUDGET = 2000
+
+
+class ParticleSystem:
+    """
+    Fading particles flying out from bursts
+    """
+
+    def __init__(self, budget=PARTICLE_BUDGET, seed=None):
+        """
+        Allocate room for budget particles
+        """
+        self.budget = budget
+        self.rng = np.random.default_rng(seed)
+
+        # State of every particle slot
+        self.position = np.zeros((budget, 2))
+        self.velocity = np.zeros((budget, 2))
+        self.angle = np.zeros(budget)
+        self.change_angle = np.zeros(budget)
+        self.alpha = np.zeros(budget)
+        self.lifetime = np.ones(budget)
+        self.elapsed = np.zeros(budget)
+        self.alive = np.zeros(budget, dtype=bool)
+
+        # Number of particles not emitted because the budget was used up
+        self.dropped = 0
+
+        # One sprite per slot. Dead particles are invisible.
+        empty = texture_registry.get("particle", (1, 1), (0, 0, 0, 0))
+        self.sprites = [arcade.Sprite(texture=empty) for _ in range(budget)]
+        for sprite in self.sprites:
+            sprite.alpha = 0
+        self.sprite_list = arcade.SpriteList()
+        self.sprite_list.extend(self.sprites)
+
+        # Slots that were alive when the sprites were last synced
+        self.shown = np.zeros(budget, dtype=bool)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.alive))
+
+    def clear(self):
+        """
+        Remove all particles. They are hidden on the next draw.
+        """
+        self.alive[:] = False
+
+    def burst(self, position, texture, scale, count=None):
+        """
+        Emit count particles with a texture from a position.
+        Like arcade's EmitBurst with FadeParticles.
+        """
+        if count is None:
+            count = int(self.rng.integers(10, 21))
+
+        free = np.flatnonzero(~self.alive)
+        if len(free) < count:
+            self.dropped += count - len(free)
+        slots = free[:count]
+        n = len(slots)
+        if n == 0:
+            return
+
+        # Random direction and speed up to 3.0, like arcade.rand_in_circle
+        direction = 2 * np.pi * self.rng.random(n)
+        speed = 3.0 * self.rng.random(n)
+
+        self.position[slots] = position
+        self.velocity[slots, 0] = speed * np.cos(direction)
+        self.velocity[slots, 1] = speed * np.sin(direction)
+        self.angle[slots] = 0.0
+        self.change_angle[slots] = self.rng.integers(-10, 11, n)
+        self.alpha[slots] = 255.0
+        self.lifetime[slots] = self.rng.uniform(0.5, 1.0, n)
+        self.elapsed[slots] = 0.0
+        self.alive[slots] = True
+
+        for i in slots:
+            sprite = self.sprites[i]
+            sprite.texture = texture
+            sprite.scale = scale
+
+    def update(self, delta_time=1/60):
+        """
+        Move and fade all live particles
+        """
+        alive = self.alive
+        if not alive.any():
+            return
+
+        # Velocities are in pixels per 1/60 s, like arcade particles
+        frames = delta_time * 60
+
+        self.position[alive] += self.velocity[alive] * frames
+        self.angle[alive] += self.change_angle[alive] * frames
+        self.elapsed[alive] += delta_time
+
+        # Fade from 255 to 0 over the lifetime
+        self.alpha[alive] = np.clip(
+            255 * (1 - self.elapsed[alive] / self.lifetime[alive]), 0, 255
+        )
+
+        # Reap particles that have lived their lifetime
+        self.alive &= self.elapsed < self.lifetime
+
+    def sync_sprites(self):
+        """
+        Copy the particle state to the sprites. Only needed for drawing.
+        """
+        for i in np.flatnonzero(self.alive):
+            sprite = self.sprites[i]
+            x, y = self.position[i]
+            sprite.position = (float(x), float(y))
+            sprite.angle = float(self.angle[i])
+            sprite.alpha = int(self.alpha[i])
+
+        # Hide particles that died since the last sync
+        for i in np.flatnonzero(self.shown & ~self.alive):
+            self.sprites[i].alpha = 0
+
+        self.shown = self.alive.copy()
+
+    def draw(self):
+        """
+        Draw all live particles with one draw call
+        """
+        self.sync_sprites()
+        self.sprite_list.draw()
@@ -0,0 +1,123 @@
+"""
+A pool of acrobats.
+
+An acrobat is killed and a new one spawned on every bounce and every
+lost life. Instead of building a new sprite, pymunk body and shape each
+time, dead acrobats are taken out of the space and kept here, and the
+next spawn puts one back with a fresh position and velocity.
+"""
+
+import math
+
+# Import sprites from local file my_sprites.py
+from my_sprites import Acrobat
+
+
+def add_physics_object(physics_engine, sprite, physics_object):
+    """
+    Put a sprite back into a PymunkPhysicsEngine with the body and shape
+    it had before it was removed.
+
+    Arcade has no call for this. add_sprite() always builds a new body and
+    shape, so this does the rest of what it does by hand, writing the
+    engine's sprites dict and non_static_sprite_list. It depends on those
+    internals of arcade 2.6 and needs checking when arcade is upgraded.
+    """
+    physics_engine.sprites[sprite] = physics_object
+    physics_engine.non_static_sprite_list.append(sprite)
+    physics_engine.space.add(physics_object.body, physics_object.shape)
+    sprite.register_physics_engine(physics_engine)
+
+
+class AcrobatPool:
+    """
+    Recycles acrobat sprites together with their physics bodies
+    """
+
+    def __init__(self, physics_engine, acrobats, scale=1, gravity=(0, 0), collision_type="acrobat", shape_filter=None):
+        """
+        Live acrobats are kept in the SpriteList acrobats. New acrobats'
+        shapes get shape_filter, if one is given.
+        """
+        self.physics_engine = physics_engine
+        self.acrobats = acrobats
+        self.scale = scale
+        self.gravity = gravity
+        self.collision_type = collision_type
+        self.shape_filter = shape_filter
+
+        # Dead acrobats and their physics objects, ready for reuse
+        self.free = []
+
+        # Number of acquires served from the pool and by building a new acrobat
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.free)
+
+    def acquire(self, position, velocity, angular_velocity=0.0):
+        """
+        Put a live acrobat into the game and return it
+        """
+        if self.free:
+            self.hits += 1
+            a, physics_object = self.free.pop()
+
+            # Put the body back into the space
+            add_physics_object(self.physics_engine, a, physics_object)
+        else:
+            self.misses += 1
+            a = Acrobat(
+                center_x=position[0],
+                center_y=position[1],
+                scale=self.scale,
+            )
+
+            self.physics_engine.add_sprite(
+                sprite=a,
+                mass=1,
+                gravity=self.gravity,
+                collision_type=self.collision_type,
+                elasticity=1.0,
+                moment_of_inertia=40000.0 # math.inf, # Can not spin
+            )
+            physics_object = self.physics_engine.get_physics_object(a)
+            if self.shape_filter is not None:
+                physics_object.shape.filter = self.shape_filter
+
+        # Reset the body in place
+        body = physics_object.body
+        body.position = position
+        body.velocity = velocity
+        body.angle = 0.0
+        body.angular_velocity = angular_velocity
+        body.force = (0, 0)
+        body.torque = 0.0
+
+        # Move the sprite to match the body
+        a.position = position
+        a.angle = math.degrees(body.angle)
+
+        # Add the new acrobat to the list of acrobats (so we can draw the sprites)
+        self.acrobats.append(a)
+
+        return a
+
+    def release(self, a):
+        """
+        Take a dead acrobat out of the game and keep it for later
+        """
+        physics_object = self.physics_engine.get_physics_object(a)
+
+        # Removes the sprite from the SpriteList and the physics engine
+        a.kill()
+
+        self.free.append((a, physics_object))
+
+    @property
+    def stats(self):
+        """
+        Pool hits and misses
+        """
+        return {"hits": self.hits, "misses": self.misses, "free": len(self.free)}
@@ -0,0 +1,107 @@
+"""
+Time the phases of a frame.
+
+The game calls lap() after each phase of a frame. The profiler keeps
+the last samples of every phase, so rolling p50/p95/p99 values can be
+shown on screen or saved to a CSV file.
+"""
+
+import csv
+import time
+from collections import deque
+
+# Number of frames the rolling percentiles are calculated over
+PROFILER_WINDOW = 600
+
+
+class FrameProfiler:
+    """
+    Rolling timings of the phases of a frame
+    """
+
+    def __init__(self, window=PROFILER_WINDOW):
+        self.window = window
+
+        # The last times in seconds of each phase, in the order phases were first seen
+        self.samples = {}
+
+        # Number of times each phase has been timed
+        self.counts = {}
+
+    def now(self):
+        """
+        Start timing. Pass the returned value to lap().
+        """
+        return time.perf_counter()
+
+    def lap(self, phase, start):
+        """
+        Record the time since start for a phase. Returns the time now,
+        which is the start of the next phase.
+        """
+        end = time.perf_counter()
+        self.record(phase, end - start)
+        return end
+
+    def record(self, phase, seconds):
+        """
+        Add a time in seconds for a phase
+        """
+        samples = self.samples.get(phase)
+        if samples is None:
+            samples = self.samples[phase] = deque(maxlen=self.window)
+            self.counts[phase] = 0
+        samples.append(seconds)
+        self.counts[phase] += 1
+
+    def percentiles(self, phase):
+        """
+        Return p50, p95 and p99 of a phase in seconds
+        """
+        samples = sorted(self.samples[phase])
+        last = len(samples) - 1
+        return tuple(samples[round(last * p)] for p in (0.50, 0.95, 0.99))
+
+    def report(self):
+        """
+        Return a list of (phase, p50, p95, p99) in milliseconds
+        """
+        rows = []
+        for phase in self.samples:
+            p50, p95, p99 = self.percentiles(phase)
+            rows.append((phase, p50 * 1000, p95 * 1000, p99 * 1000))
+        return rows
+
+    def dump_csv(self, filename):
+        """
+        Save the rolling timings of all phases to a CSV file
+        """
+        with open(filename, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["phase", "count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+            for phase, p50, p95, p99 in self.report():
+                samples = self.samples[phase]
+                writer.writerow([
+                    phase,
+                    self.counts[phase],
+                    f"{sum(samples) / len(samples) * 1000:.4f}",
+                    f"{p50:.4f}",
+                    f"{p95:.4f}",
+                    f"{p99:.4f}",
+                    f"{max(samples) * 1000:.4f}",
+                ])
+
+
+class NullProfiler:
+    """
+    A profiler that does nothing. Used when profiling is off.
+    """
+
+    def now(self):
+        return 0.0
+
+    def lap(self, phase, start):
+        return start
+
+    def record(self, phase, seconds):
+        pass
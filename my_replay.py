@@ -0,0 +1,268 @@
+"""
+Record games and replay them without a window.
+
+A recording holds the seed and settings of the Simulation and a binary
+stream of tick-stamped input changes, including analog movement rounded
+to MOVE_STEPS steps. Every CHECKPOINT_INTERVAL ticks
+the score, lives and number of balloons are stored too. Replaying runs
+the Simulation as fast as possible with the recorded inputs and checks
+that the game reaches the same checkpoints.
+
+Replay a recording with: python my_replay.py game.rec
+"""
+
+import argparse
+import json
+import struct
+import sys
+import time
+from typing import NamedTuple
+
+from my_simulation import Simulation, MOVE_STEPS
+
+# Ticks between checkpoints
+CHECKPOINT_INTERVAL = 60
+
+# File layout: header, settings as JSON, then records
+MAGIC = b"CIRCREC1"
+HEADER = struct.Struct("<8sQI")  # magic, seed, length of settings
+RECORD_TYPE = struct.Struct("<B")
+INPUT = struct.Struct("<IB")  # tick, input bits
+CHECKPOINT = struct.Struct("<Iiii")  # tick, score, lives, balloons
+MOVE = struct.Struct("<Ib")  # tick, analog movement in steps
+
+RECORD_INPUT = 0
+RECORD_CHECKPOINT = 1
+RECORD_MOVE = 2
+
+# Input bits
+INPUT_LEFT = 0b001
+INPUT_RIGHT = 0b010
+INPUT_FLIP = 0b100
+
+
+def pack_input(left, right, flip):
+    """
+    Return the input bits for a tick
+    """
+    return (INPUT_LEFT if left else 0) | (INPUT_RIGHT if right else 0) | (INPUT_FLIP if flip else 0)
+
+
+def unpack_input(bits):
+    """
+    Return (left, right, flip) from input bits
+    """
+    return bool(bits & INPUT_LEFT), bool(bits & INPUT_RIGHT), bool(bits & INPUT_FLIP)
+
+
+class Checkpoint(NamedTuple):
+    tick: int
+    score: int
+    lives: int
+    balloons: int
+
+
+class Recording:
+    """
+    The seed, settings, inputs and checkpoints of one game
+    """
+
+    def __init__(self, seed, settings, inputs=None, checkpoints=None, moves=None):
+        self.seed = seed
+        self.settings = settings
+
+        # (tick, input bits) for every tick where the input changed
+        self.inputs = inputs or []
+        self.checkpoints = checkpoints or []
+        # (tick, steps) for every tick where the analog movement changed
+        self.moves = moves or []
+
+    @property
+    def ticks(self):
+        """
+        The last tick in the recording
+        """
+        last = 0
+        if self.inputs:
+            last = self.inputs[-1][0]
+        if self.checkpoints:
+            last = max(last, self.checkpoints[-1].tick)
+        if self.moves:
+            last = max(last, self.moves[-1][0])
+        return last
+
+    def save(self, filename):
+        """
+        Write the recording to a file
+        """
+        settings = json.dumps(self.settings).encode()
+
+        # Inputs and checkpoints are written in tick order
+        records = [(tick, RECORD_INPUT, INPUT.pack(tick, bits)) for tick, bits in self.inputs]
+        records += [(c.tick, RECORD_CHECKPOINT, CHECKPOINT.pack(*c)) for c in self.checkpoints]
+        records += [(tick, RECORD_MOVE, MOVE.pack(tick, steps)) for tick, steps in self.moves]
+        records.sort(key=lambda r: (r[0], r[1]))
+
+        with open(filename, "wb") as f:
+            f.write(HEADER.pack(MAGIC, self.seed, len(settings)))
+            f.write(settings)
+            for _, record_type, data in records:
+                f.write(RECORD_TYPE.pack(record_type))
+                f.write(data)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Read a recording from a file
+        """
+        with open(filename, "rb") as f:
+            data = f.read()
+
+        magic, seed, settings_length = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not a game recording")
+
+        offset = HEADER.size
+        settings = json.loads(data[offset:offset + settings_length])
+        offset += settings_length
+
+        recording = cls(seed, settings)
+        while offset < len(data):
+            (record_type,) = RECORD_TYPE.unpack_from(data, offset)
+            offset += RECORD_TYPE.size
+            if record_type == RECORD_INPUT:
+                recording.inputs.append(INPUT.unpack_from(data, offset))
+                offset += INPUT.size
+            elif record_type == RECORD_CHECKPOINT:
+                recording.checkpoints.append(Checkpoint(*CHECKPOINT.unpack_from(data, offset)))
+                offset += CHECKPOINT.size
+            elif record_type == RECORD_MOVE:
+                recording.moves.append(MOVE.unpack_from(data, offset))
+                offset += MOVE.size
+            else:
+                raise ValueError(f"Unknown record type {record_type} in {filename}")
+
+        return recording
+
+
+def get_checkpoint(sim):
+    """
+    Return a checkpoint of the Simulation's current state
+    """
+    return Checkpoint(sim.ticks, int(sim.player_score), int(sim.player_lives), int(sim.no_of_ballons))
+
+
+class InputRecorder:
+    """
+    Steps a Simulation and records its inputs
+    """
+
+    def __init__(self, sim, checkpoint_interval=CHECKPOINT_INTERVAL):
+        self.sim = sim
+        self.checkpoint_interval = checkpoint_interval
+        self.recording = Recording(sim.seed, sim.settings)
+        self.last_bits = 0
+        self.last_steps = 0
+
+    def step(self, left=False, right=False, flip=False, move=0.0):
+        """
+        Record the inputs and step the Simulation. move must be
+        a whole number of steps, as from my_input.
+        """
+        bits = pack_input(left, right, flip)
+        if bits != self.last_bits:
+            # Inputs are stamped with the tick they are used in
+            self.recording.inputs.append((self.sim.ticks + 1, bits))
+            self.last_bits = bits
+
+        steps = round(move * MOVE_STEPS)
+        if steps != self.last_steps:
+            self.recording.moves.append((self.sim.ticks + 1, steps))
+            self.last_steps = steps
+
+        self.sim.step(left=left, right=right, flip=flip, move=steps / MOVE_STEPS)
+
+        if self.sim.ticks % self.checkpoint_interval == 0:
+            self.recording.checkpoints.append(get_checkpoint(self.sim))
+
+    def save(self, filename):
+        """
+        Add a last checkpoint and write the recording to a file
+        """
+        if not self.recording.checkpoints or self.recording.checkpoints[-1].tick != self.sim.ticks:
+            self.recording.checkpoints.append(get_checkpoint(self.sim))
+        self.recording.save(filename)
+
+
+class ReplayResult(NamedTuple):
+    ticks: int
+    seconds: float
+    # (expected, actual) checkpoints that did not match
+    mismatches: list
+    final: Checkpoint
+
+
+def replay(recording):
+    """
+    Play a recording as fast as possible and compare the checkpoints
+    """
+    sim = Simulation(seed=recording.seed, **recording.settings)
+
+    inputs = iter(recording.inputs)
+    next_input = next(inputs, None)
+    checkpoints = iter(recording.checkpoints)
+    next_checkpoint = next(checkpoints, None)
+    moves = iter(recording.moves)
+    next_move = next(moves, None)
+
+    left = right = flip = False
+    move = 0.0
+    mismatches = []
+    last_tick = recording.ticks
+
+    start = time.perf_counter()
+    while sim.ticks < last_tick:
+        tick = sim.ticks + 1
+        if next_input is not None and next_input[0] == tick:
+            left, right, flip = unpack_input(next_input[1])
+            next_input = next(inputs, None)
+        if next_move is not None and next_move[0] == tick:
+            move = next_move[1] / MOVE_STEPS
+            next_move = next(moves, None)
+
+        sim.step(left=left, right=right, flip=flip, move=move)
+
+        if next_checkpoint is not None and next_checkpoint.tick == tick:
+            actual = get_checkpoint(sim)
+            if actual != next_checkpoint:
+                mismatches.append((next_checkpoint, actual))
+            next_checkpoint = next(checkpoints, None)
+    seconds = time.perf_counter() - start
+
+    return ReplayResult(sim.ticks, seconds, mismatches, get_checkpoint(sim))
+
+
+def main():
+    """
+    Main method
+    """
+    parser = argparse.ArgumentParser(description="Replay a recorded game without a window")
+    parser.add_argument("recording", help="file written by InputRecorder.save()")
+    args = parser.parse_args()
+
+    result = replay(Recording.load(args.recording))
+
+    print(
+        f"Replayed {result.ticks} ticks in {result.seconds:.3f} s "
+        f"({result.ticks / max(result.seconds, 1e-9):.0f} ticks/s)"
+    )
+    print(f"Score {result.final.score}, lives {result.final.lives}, balloons {result.final.balloons}")
+
+    for expected, actual in result.mismatches:
+        print(f"Mismatch at tick {expected.tick}: expected {expected}, got {actual}")
+
+    sys.exit(1 if result.mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
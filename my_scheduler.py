@@ -0,0 +1,65 @@
+"""
+Active-set scheduler.
+
+Most sprites have nothing to do on most ticks: a balloon only changes
+while it fades out after being popped, and the passanger only moves
+when the seesaw does. Instead of calling update() on every sprite, the
+game adds a sprite to a group of the Scheduler when it gets work, and
+the Scheduler ticks only the sprites in the groups until their work is
+done.
+"""
+
+
+class Scheduler:
+    """
+    Groups of sprites with pending work
+    """
+
+    def __init__(self):
+        # Work function and active sprites of each group. The sprites are
+        # kept in dicts, so they are ticked in the order they were added.
+        self.work = {}
+        self.active = {}
+
+        # Number of sprites in each group at the last tick
+        self.sizes = {}
+
+    def add_group(self, group, work):
+        """
+        Add a group of sprites. work(sprite) is called on every tick
+        and returns True while the sprite has more work to do.
+        """
+        self.work[group] = work
+        self.active[group] = {}
+        self.sizes[group] = 0
+
+    def add(self, group, sprite):
+        """
+        Tick a sprite until its work is done. Adding it again does nothing.
+        """
+        self.active[group][sprite] = None
+
+    def clear(self, group):
+        """
+        Drop all sprites from a group and return them
+        """
+        sprites = list(self.active[group])
+        self.active[group].clear()
+        return sprites
+
+    def __len__(self):
+        return sum(len(sprites) for sprites in self.active.values())
+
+    def tick(self):
+        """
+        Do the work of every active sprite and drop those that are done
+        """
+        for group, sprites in self.active.items():
+            self.sizes[group] = len(sprites)
+            if not sprites:
+                continue
+
+            work = self.work[group]
+            done = [s for s in sprites if not work(s)]
+            for s in done:
+                del sprites[s]
@@ -0,0 +1,254 @@
+"""
+High scores that never block the game.
+
+ScoreStore keeps every finished game's score in an SQLite database in
+WAL mode. add() only appends the score to a queue. A background thread
+writes the queue in batches, one transaction per batch, so the game
+never waits for the disk and thousands of headless runs a minute can be
+stored. Reads use indexes on the score and on the player, and include
+the scores still waiting in the queue, so a game's own score shows on
+the game over screen straight away.
+
+    from my_scores import high_scores
+    high_scores.start("scores.db")
+    high_scores.add("alice", 120, level=2)
+    high_scores.top(10)
+"""
+
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+
+from my_log import log
+
+# File the game keeps its high scores in
+SCORES_FILE = "scores.db"
+
+# Scores written in one transaction at most
+BATCH_SIZE = 1000
+
+# Seconds the writer waits for more scores before writing
+FLUSH_INTERVAL = 0.5
+
+# Seconds reads wait for the writer to create the database
+READY_TIMEOUT = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    player TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    level INTEGER,
+    ticks INTEGER,
+    seed INTEGER,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_by_score ON scores (score DESC, created);
+CREATE INDEX IF NOT EXISTS scores_by_player ON scores (player, score DESC, created);
+"""
+
+INSERT = "INSERT INTO scores (player, score, level, ticks, seed, created) VALUES (?, ?, ?, ?, ?, ?)"
+
+
+class HighScore(NamedTuple):
+    player: str
+    score: int
+    level: object
+    ticks: object
+    seed: object
+    # Time the game ended, in seconds since the epoch
+    created: float
+
+
+def sort_key(s):
+    """
+    Best first, and the older of two equal scores first
+    """
+    return (-s.score, s.created)
+
+
+class ScoreStore:
+    """
+    High scores in SQLite, written by a background thread
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.filename = None
+
+        # Scores not written yet. The writer takes them from the
+        # front, and they stay in pending until they are committed.
+        self.queue = deque()
+        self.pending = []
+        self.lock = threading.Lock()
+
+        # Held while a batch is committed and taken out of pending, and
+        # while a read runs, so a read never sees a batch both in the
+        # database and in pending. add() never waits for it.
+        self.commit_lock = threading.Lock()
+
+        # Number of scores written, and the time spent writing them
+        self.written = 0
+        self.write_time = 0.0
+
+        self.thread = None
+        self.wake = threading.Event()
+        self.stopping = threading.Event()
+        self.ready = threading.Event()
+        self.error = None
+
+        # Every reading thread has its own connection
+        self.local = threading.local()
+
+    def start(self, filename=SCORES_FILE):
+        """
+        Open the database, creating it if needed, and start the writer thread
+        """
+        if self.thread is not None:
+            return
+
+        self.filename = filename
+        self.stopping.clear()
+        self.ready.clear()
+        self.thread = threading.Thread(target=self.run, name="ScoreStore", daemon=True)
+        self.thread.start()
+
+    def connect(self):
+        """
+        Open a connection to the database
+        """
+        connection = sqlite3.connect(self.filename)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # In WAL mode a commit is safe from corruption without a sync
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def add(self, player, score, level=None, ticks=None, seed=None):
+        """
+        Queue the score of a finished game. Returns at once.
+        """
+        s = HighScore(player, int(score), level, ticks, seed, time.time())
+        with self.lock:
+            self.queue.append(s)
+            self.pending.append(s)
+            full = len(self.queue) >= self.batch_size
+        if full:
+            self.wake.set()
+        return s
+
+    def run(self):
+        """
+        The writer thread
+        """
+        try:
+            connection = self.connect()
+            connection.executescript(SCHEMA)
+        except sqlite3.Error as e:
+            self.error = e
+            self.ready.set()
+            log.error("scores", "Cannot open %s: %s", self.filename, e)
+            return
+        self.ready.set()
+
+        while True:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            stopping = self.stopping.is_set()
+            self.write(connection)
+            if stopping:
+                break
+
+        connection.close()
+
+    def write(self, connection):
+        """
+        Write all queued scores, a batch per transaction
+        """
+        while True:
+            with self.lock:
+                batch = [self.queue.popleft() for _ in range(min(self.batch_size, len(self.queue)))]
+            if not batch:
+                return
+
+            start = time.perf_counter()
+            with self.commit_lock:
+                try:
+                    with connection:
+                        connection.executemany(INSERT, batch)
+                except sqlite3.Error as e:
+                    # Keep the scores and try again on the next flush
+                    with self.lock:
+                        self.queue.extendleft(reversed(batch))
+                    log.error("scores", "Cannot write %d scores: %s", len(batch), e)
+                    return
+
+                # Written scores are read from the database from now on
+                with self.lock:
+                    del self.pending[:len(batch)]
+            self.write_time += time.perf_counter() - start
+            self.written += len(batch)
+
+    def stop(self):
+        """
+        Write the remaining scores and stop the writer thread
+        """
+        if self.thread is None:
+            return
+
+        self.stopping.set()
+        self.wake.set()
+        self.thread.join()
+        self.thread = None
+
+    def get_connection(self):
+        """
+        Return the calling thread's connection, or None if there is no database
+        """
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            if self.thread is None or not self.ready.wait(READY_TIMEOUT) or self.error:
+                return None
+            connection = self.local.connection = self.connect()
+        return connection
+
+    def read(self, sql, args, player=None):
+        """
+        Return the rows of a query and the scores not written yet, both
+        from the same moment, so no score is missed or counted twice
+        """
+        connection = self.get_connection()
+        with self.commit_lock:
+            with self.lock:
+                pending = [s for s in self.pending if player is None or s.player == player]
+            rows = connection.execute(sql, args).fetchall() if connection is not None else []
+        return rows, pending
+
+    def top(self, n=10):
+        """
+        Return the best n scores of all players
+        """
+        rows, pending = self.read(
+            "SELECT player, score, level, ticks, seed, created FROM scores "
+            "ORDER BY score DESC, created LIMIT ?",
+            (n,),
+        )
+        return sorted([HighScore(*row) for row in rows] + pending, key=sort_key)[:n]
+
+    def player_top(self, player, n=10):
+        """
+        Return a player's best n scores
+        """
+        rows, pending = self.read(
+            "SELECT player, score, level, ticks, seed, created FROM scores "
+            "WHERE player = ? ORDER BY score DESC, created LIMIT ?",
+            (player, n),
+            player,
+        )
+        return sorted([HighScore(*row) for row in rows] + pending, key=sort_key)[:n]
+
+
+# The high scores of the game
+high_scores = ScoreStore()
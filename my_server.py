@@ -0,0 +1,598 @@
+"""
+Headless server for two-player games over UDP.
+
+Players are paired in the order they connect. Each match runs two
+Simulations with the same seed and level, one per player, at a fixed
+tick rate, with the inputs the clients send. Every SEND_INTERVAL ticks
+each client gets the state of its own game and the opponent's score, as
+described in my_net.py. A match is over when both games are.
+
+All matches run in one thread, so one process hosts as many matches as
+fit into a tick. The server logs the time of its ticks and the bandwidth
+of every client now and then, and prints a report when it stops.
+
+Run a server with: python my_server.py
+Try it with two bots on localhost, 50 ms each way and 5 % packet loss:
+
+    python my_server.py --bots 2 --latency 50 --loss 5
+"""
+
+import argparse
+import os
+import random
+import select
+import socket
+import struct
+import subprocess
+import sys
+import time
+import zlib
+
+from my_simulation import Simulation, TICK_RATE, FIRST_LEVEL, MOVE_STEPS
+from my_replay import unpack_input
+from my_profiler import FrameProfiler
+from my_timestep import FixedTimestep
+from my_log import log
+from my_net import (
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    MAGIC,
+    PROTOCOL_VERSION,
+    MAX_PACKET_SIZE,
+    SEND_INTERVAL,
+    STATE_HISTORY,
+    PACKET_TYPE,
+    PACKET_HELLO,
+    PACKET_WAITING,
+    PACKET_WELCOME,
+    PACKET_INPUT,
+    PACKET_STATE,
+    PACKET_BYE,
+    HELLO,
+    WELCOME,
+    INPUT,
+    INPUT_RECORD,
+    STATE,
+    BYE,
+    STATE_KEYFRAME,
+    encode_state,
+    compress_state,
+    LossyLink,
+    Traffic,
+)
+
+# Seconds without a packet before a player is dropped
+PLAYER_TIMEOUT = 5.0
+
+# Seconds a player waits for an opponent before being sent away
+WAITING_TIMEOUT = 60.0
+
+# The bot clients started with --bots
+CLIENT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "my_client.py")
+
+# Inputs waiting to be used before the oldest are skipped. Skipped
+# flips are kept, so a player never loses a flip.
+MAX_INPUT_BACKLOG = 4
+
+# Ticks a finished match keeps sending, so the clients see the end
+MATCH_LINGER = TICK_RATE
+
+# Seconds between reports in the log
+REPORT_INTERVAL = 5.0
+
+
+class ServerPlayer:
+    """
+    A connected client and its game
+    """
+
+    def __init__(self, address, token, index):
+        self.address = address
+        self.token = token
+        self.index = index
+        self.match = None
+        self.sim = None
+        self.traffic = Traffic()
+        self.connected = self.last_heard = time.perf_counter()
+        self.gone = False
+
+        # Inputs received but not used yet, by number, as (bits, move steps)
+        self.inputs = {}
+        # Number of the last input used, and the keys and stick held then
+        self.last_input = 0
+        self.held = (False, False, 0.0)
+
+        # The newest state the client has, and the client's clock to echo back
+        self.acked = None
+        self.echo_ms = 0
+
+        # States sent, by tick, to encode the next ones against
+        self.history = {}
+        self.keyframes = 0
+        self.deltas = 0
+
+    @property
+    def is_over(self):
+        return self.gone or self.sim.is_over
+
+    def add_inputs(self, newest, records):
+        """
+        Keep the inputs of a packet that have not been used yet
+        """
+        first = newest - len(records) + 1
+        for number, record in enumerate(records, first):
+            if number > self.last_input:
+                self.inputs[number] = record
+
+    def next_input(self):
+        """
+        Return (left, right, flip, move) for the next tick. Without a new
+        input the keys and stick stay as they were.
+        """
+        inputs = self.inputs
+        flip = False
+
+        # Too far behind: skip the oldest inputs, keeping their flips
+        while len(inputs) > MAX_INPUT_BACKLOG:
+            number = min(inputs)
+            bits, _ = inputs.pop(number)
+            flip ^= unpack_input(bits)[2]
+            self.last_input = number
+
+        number = self.last_input + 1
+        if number not in inputs and inputs:
+            # Every packet repeats the unconfirmed inputs, so a gap is never filled
+            number = min(inputs)
+
+        if number in inputs:
+            bits, steps = inputs.pop(number)
+            left, right, pressed = unpack_input(bits)
+            self.held = (left, right, steps / MOVE_STEPS)
+            self.last_input = number
+            flip ^= pressed
+
+        left, right, move = self.held
+        return left, right, flip, move
+
+
+class Match:
+    """
+    Two players playing the same level with the same seed
+    """
+
+    def __init__(self, number, players, seed, level):
+        self.number = number
+        self.players = players
+        self.seed = seed
+        self.level = level
+        self.tick = 0
+
+        # Ticks since both games ended, or None while one is running
+        self.over_ticks = None
+
+        for player in players:
+            player.match = self
+            player.sim = Simulation(seed=seed, level=level)
+
+    def opponent(self, player):
+        return self.players[1 - player.index]
+
+    def step(self):
+        """
+        Run one tick of every game that is not over
+        """
+        self.tick += 1
+        for player in self.players:
+            if not player.is_over:
+                left, right, flip, move = player.next_input()
+                player.sim.step(left=left, right=right, flip=flip, move=move)
+
+        if self.over_ticks is not None:
+            self.over_ticks += 1
+        elif all(player.is_over for player in self.players):
+            self.over_ticks = 0
+
+    @property
+    def finished(self):
+        return self.over_ticks is not None and self.over_ticks >= MATCH_LINGER
+
+
+class GameServer:
+    """
+    Runs matches for clients connecting over UDP
+    """
+
+    def __init__(
+        self,
+        host=DEFAULT_HOST,
+        port=DEFAULT_PORT,
+        tick_rate=TICK_RATE,
+        send_interval=SEND_INTERVAL,
+        level=FIRST_LEVEL,
+        latency=0.0,
+        jitter=0.0,
+        loss=0.0,
+        seed=None,
+    ):
+        """
+        latency and jitter in seconds and loss as a fraction are applied
+        to the packets the server sends
+        """
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.address = self.sock.getsockname()
+        self.link = LossyLink(self.sock, latency, jitter, loss, seed)
+
+        self.tick_rate = tick_rate
+        self.send_interval = send_interval
+        self.level = level
+        self.rng = random.Random(seed)
+
+        # Connected players by address, and the one waiting for an opponent
+        self.players = {}
+        self.waiting = None
+        self.matches = []
+        self.match_count = 0
+        self.finished_matches = 0
+
+        # Report lines of the players of finished matches
+        self.results = []
+
+        self.timestep = FixedTimestep(tick_rate)
+        self.profiler = FrameProfiler()
+        self.ticks = 0
+
+        # Packets that could not be read
+        self.bad_packets = 0
+
+    def send(self, player, data):
+        player.traffic.sent(len(data))
+        self.link.sendto(data, player.address)
+
+    def send_welcome(self, player):
+        self.send(player, WELCOME.pack(
+            PACKET_WELCOME,
+            player.token,
+            player.index,
+            -1 if self.level is None else self.level,
+            self.tick_rate,
+            self.send_interval,
+        ))
+
+    def handle_packet(self, data, address):
+        """
+        Handle one packet from a client
+        """
+        (packet_type,) = PACKET_TYPE.unpack_from(data)
+        player = self.players.get(address)
+        if player is not None:
+            player.traffic.received(len(data))
+            player.last_heard = time.perf_counter()
+
+        if packet_type == PACKET_HELLO:
+            _, magic, version = HELLO.unpack_from(data)
+            if magic != MAGIC or version != PROTOCOL_VERSION:
+                self.bad_packets += 1
+                return
+            if player is None:
+                player = self.add_player(address)
+                player.traffic.received(len(data))
+
+            # Hellos are repeated until the client is welcomed
+            if player.match is None:
+                player.traffic.sent(PACKET_TYPE.size)
+                self.link.sendto(PACKET_TYPE.pack(PACKET_WAITING), address)
+            else:
+                self.send_welcome(player)
+
+        elif packet_type == PACKET_INPUT:
+            _, token, acked, client_ms, newest, count = INPUT.unpack_from(data)
+            if player is None or token != player.token or player.match is None:
+                self.bad_packets += 1
+                return
+            records = [
+                INPUT_RECORD.unpack_from(data, INPUT.size + i * INPUT_RECORD.size)
+                for i in range(count)
+            ]
+            player.add_inputs(newest, records)
+            if player.acked is None or acked > player.acked:
+                player.acked = acked
+            player.echo_ms = client_ms
+
+        elif packet_type == PACKET_BYE:
+            _, token = BYE.unpack_from(data)
+            if player is not None and token == player.token:
+                self.remove_player(player)
+
+        else:
+            self.bad_packets += 1
+
+    def add_player(self, address):
+        """
+        Add a new client, and start a match if another one is waiting
+        """
+        player = ServerPlayer(address, self.rng.getrandbits(32), 0)
+        self.players[address] = player
+        log.info("server", "Player %s:%d connected", *address)
+
+        if self.waiting is None:
+            self.waiting = player
+            return player
+
+        opponent, self.waiting = self.waiting, None
+        player.index = 1
+        self.match_count += 1
+        match = Match(self.match_count, [opponent, player], self.rng.randrange(2**63), self.level)
+        self.matches.append(match)
+        for p in match.players:
+            self.send_welcome(p)
+        log.info("server", "Match %d started with seed %d", match.number, match.seed)
+        return player
+
+    def remove_player(self, player):
+        """
+        Forget a client. Its game in a running match is over.
+        """
+        player.gone = True
+        self.players.pop(player.address, None)
+        if self.waiting is player:
+            self.waiting = None
+        log.info("server", "Player %s:%d left", *player.address)
+
+    def receive(self):
+        """
+        Handle every packet waiting on the socket
+        """
+        while True:
+            try:
+                data, address = self.sock.recvfrom(MAX_PACKET_SIZE)
+            except (BlockingIOError, InterruptedError):
+                return
+            except ConnectionResetError:
+                continue
+            try:
+                self.handle_packet(data, address)
+            except (struct.error, zlib.error, ValueError):
+                self.bad_packets += 1
+
+    def send_state(self, match, player):
+        """
+        Send a player the state of its game, against the last state it has
+        """
+        data = encode_state(
+            player.sim, match.opponent(player).sim, player.gone, match.opponent(player).gone
+        )
+        baseline = player.history.get(player.acked)
+        if baseline is not None and len(baseline) != len(data):
+            baseline = None
+
+        flags = 0
+        if baseline is None:
+            flags |= STATE_KEYFRAME
+            player.keyframes += 1
+        else:
+            player.deltas += 1
+
+        self.send(player, STATE.pack(
+            PACKET_STATE,
+            match.tick,
+            0 if baseline is None else player.acked,
+            player.last_input,
+            player.echo_ms,
+            flags,
+        ) + compress_state(data, baseline))
+
+        history = player.history
+        history[match.tick] = data
+        while len(history) > STATE_HISTORY:
+            del history[next(iter(history))]
+
+    def tick(self):
+        """
+        Run one tick of every match and send the states that are due
+        """
+        profiler = self.profiler
+        self.ticks += 1
+        now = time.perf_counter()
+
+        t = profiler.now()
+        waiting = self.waiting
+        if waiting is not None:
+            if now - waiting.last_heard > PLAYER_TIMEOUT:
+                self.remove_player(waiting)
+            elif now - waiting.connected > WAITING_TIMEOUT:
+                self.send(waiting, BYE.pack(PACKET_BYE, waiting.token))
+                self.remove_player(waiting)
+
+        for match in self.matches:
+            for player in match.players:
+                if not player.gone and now - player.last_heard > PLAYER_TIMEOUT:
+                    self.remove_player(player)
+            match.step()
+        t = profiler.lap("simulate", t)
+
+        for match in self.matches:
+            if match.tick % self.send_interval == 0 or match.over_ticks is not None:
+                for player in match.players:
+                    if not player.gone:
+                        self.send_state(match, player)
+        t = profiler.lap("send", t)
+
+        for match in [m for m in self.matches if m.finished]:
+            self.end_match(match)
+
+        if self.matches:
+            profiler.record("match", (t - now) / len(self.matches))
+
+    def end_match(self, match):
+        """
+        Drop a finished match and its players
+        """
+        self.matches.remove(match)
+        self.finished_matches += 1
+        scores = " to ".join(str(int(p.sim.player_score)) for p in match.players)
+        log.info("server", "Match %d over after %d ticks, %s", match.number, match.tick, scores)
+        for player in match.players:
+            self.results.append(self.get_player_line(match, player))
+            if not player.gone:
+                self.remove_player(player)
+
+    def run(self, duration=None, until_idle=False, report_interval=REPORT_INTERVAL, keep_running=None):
+        """
+        Serve until duration seconds have passed, with until_idle until
+        every match has finished and nobody is waiting, or until
+        keep_running() returns False
+        """
+        start = last = last_report = time.perf_counter()
+        served = False
+        while True:
+            now = time.perf_counter()
+            if duration is not None and now - start >= duration:
+                break
+            if keep_running is not None and not keep_running():
+                break
+            if until_idle and served and not self.matches and self.waiting is None:
+                break
+
+            t = self.profiler.now()
+            self.receive()
+            self.link.flush()
+            self.profiler.lap("receive", t)
+
+            for _ in range(self.timestep.advance(now - last)):
+                self.tick()
+            last = now
+            served = served or bool(self.matches)
+
+            if report_interval and now - last_report >= report_interval:
+                last_report = now
+                for line in self.report():
+                    log.info("server", "%s", line)
+
+            # Sleep until the next tick or the next delayed packet
+            timeout = self.timestep.tick_time - self.timestep.accumulator
+            due = self.link.next_due()
+            if due is not None:
+                timeout = min(timeout, due)
+            select.select([self.sock], [], [], max(timeout, 0.0))
+
+    def report(self):
+        """
+        Return lines with the server's tick times and every client's bandwidth
+        """
+        tick_budget = 1000 / self.tick_rate
+        lines = [
+            f"ticks={self.ticks} matches={len(self.matches)} finished={self.finished_matches} "
+            f"players={len(self.players)} dropped_s={self.timestep.dropped:.2f} "
+            f"bad_packets={self.bad_packets} link_dropped={self.link.dropped}"
+        ]
+        for phase, p50, p95, p99 in self.profiler.report():
+            samples = self.profiler.samples[phase]
+            mean = sum(samples) / len(samples) * 1000
+            lines.append(f"{phase:<9} mean={mean:.3f}ms p50={p50:.3f}ms p99={p99:.3f}ms")
+
+        match_times = self.profiler.samples.get("match")
+        if match_times:
+            mean = sum(match_times) / len(match_times) * 1000
+            lines.append(f"about {tick_budget / mean:.0f} matches per core at {self.tick_rate} ticks/s")
+
+        lines += self.results
+        for match in self.matches:
+            for player in match.players:
+                lines.append(self.get_player_line(match, player))
+        return lines
+
+    def get_player_line(self, match, player):
+        """
+        Return a report line with a player's bandwidth and score
+        """
+        out_rate, in_rate = player.traffic.rates()
+        sent = player.keyframes + player.deltas
+        return (
+            f"match {match.number} player {player.index} "
+            f"out={out_rate:.1f}kbit/s in={in_rate:.1f}kbit/s "
+            f"keyframes={player.keyframes}/{sent} score={int(player.sim.player_score)}"
+        )
+
+    def close(self):
+        self.sock.close()
+
+
+def start_bots(count, address, args):
+    """
+    Start headless bot clients in their own processes
+    """
+    command = [
+        sys.executable, CLIENT_SCRIPT, "--bot",
+        "--host", address[0], "--port", str(address[1]),
+        "--latency", str(args.latency), "--jitter", str(args.jitter), "--loss", str(args.loss),
+    ]
+    if args.duration is not None:
+        command += ["--duration", str(args.duration)]
+    return [subprocess.Popen(command + ["--seed", str(i)]) for i in range(count)]
+
+
+def main():
+    """
+    Main method
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--tick-rate", type=int, default=TICK_RATE)
+    parser.add_argument("--send-interval", type=int, default=SEND_INTERVAL, help="ticks between states sent")
+    parser.add_argument("--latency", type=float, default=0.0, help="ms added to every packet sent")
+    parser.add_argument("--jitter", type=float, default=0.0, help="ms of random latency either way")
+    parser.add_argument("--loss", type=float, default=0.0, help="percent of packets dropped")
+    parser.add_argument("--duration", type=float, help="seconds to serve")
+    parser.add_argument("--bots", type=int, default=0, help="bot clients to start, two per match")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    log.start()
+
+    server = GameServer(
+        host=args.host,
+        port=args.port,
+        tick_rate=args.tick_rate,
+        send_interval=args.send_interval,
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        loss=args.loss / 100,
+        seed=args.seed,
+    )
+    log.info("server", "Listening on %s:%d", *server.address)
+
+    bots = start_bots(args.bots, server.address, args) if args.bots else []
+    failed = []
+
+    def bots_running():
+        """
+        False once a bot has failed, as its opponent would wait for nothing
+        """
+        for i, bot in enumerate(bots):
+            if bot.poll():
+                log.error("server", "Bot %d exited with code %d", i, bot.returncode)
+                failed.append(i)
+                return False
+        return True
+
+    try:
+        server.run(duration=args.duration, until_idle=bool(bots), keep_running=bots_running)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for bot in bots:
+            if failed:
+                bot.terminate()
+            bot.wait()
+        server.close()
+        log.stop()
+
+    for line in server.report():
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,983 @@
+"""
+The rules of the game without a window.
+
+The Simulation owns the physics engine, the balloons, the acrobats,
+the score and the lives. It can be stepped with scripted inputs
+without creating a window or a GL context, so it can run as fast as
+the CPU allows. GameView in my_game.py draws it and feeds it input.
+"""
+
+import math
+import random
+from collections import deque
+
+import arcade
+import pymunk
+
+# Import sprites from local file my_sprites.py
+from my_sprites import Acrobat, Player, Balloon, Wall
+from my_pool import AcrobatPool
+from my_scheduler import Scheduler
+from my_profiler import NullProfiler
+from my_log import log
+from my_events import EventQueue, BalloonPopped, AcrobatLanded, LifeLost, LevelLoaded
+from my_levels import level_loader, generate_level, prepare_textures, has_level
+
+# Set the scaling of all sprites in the game
+SPRITE_SCALING = 0.5
+
+# Set the size of the screen
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 600
+
+# Variables controlling the player
+PLAYER_LIVES = 3
+PLAYER_SPEED_X = 15
+
+# Analog movement is rounded to this many steps each way, so it can be recorded exactly
+MOVE_STEPS = 127
+# Balloon rows further than this above or below every acrobat are taken
+# out of the physics space until an acrobat comes closer again
+SLEEP_DISTANCE = SCREEN_HEIGHT
+
+# Ticks per second, and physics steps per tick. More sub-steps keep
+# fast acrobats from passing through balloons.
+TICK_RATE = 60
+SUBSTEPS = 1
+
+PLAYER_START_X = SCREEN_WIDTH / 2
+PLAYER_START_Y = 50
+
+# The level a game in the window starts on
+FIRST_LEVEL = 1
+
+# Variables controlling the balloons when no level is given
+BALLOON_ROWS = 3
+BALLOON_COLS = 10
+BALLOON_SPEED = -20
+
+# Gravity pulling the acrobats down
+ACROBAT_GRAVITY = (0, -300)
+
+# Collision categories. Every kind of shape only collides with the kinds
+# in its mask, so pairs the game never handles are skipped by pymunk.
+CATEGORY_BALLOON = 0b000001
+CATEGORY_ACROBAT = 0b000010
+CATEGORY_SEESAW = 0b000100
+CATEGORY_WALL = 0b001000
+CATEGORY_CEILING = 0b010000
+CATEGORY_FLOOR = 0b100000
+
+SHAPE_FILTERS = {
+    "balloon": pymunk.ShapeFilter(categories=CATEGORY_BALLOON, mask=CATEGORY_ACROBAT),
+    "acrobat": pymunk.ShapeFilter(
+        categories=CATEGORY_ACROBAT,
+        mask=CATEGORY_BALLOON | CATEGORY_ACROBAT | CATEGORY_SEESAW
+        | CATEGORY_WALL | CATEGORY_CEILING | CATEGORY_FLOOR,
+    ),
+    "seesaw": pymunk.ShapeFilter(categories=CATEGORY_SEESAW, mask=CATEGORY_ACROBAT),
+    "wall": pymunk.ShapeFilter(categories=CATEGORY_WALL, mask=CATEGORY_ACROBAT),
+    "ceiling": pymunk.ShapeFilter(categories=CATEGORY_CEILING, mask=CATEGORY_ACROBAT),
+    "floor": pymunk.ShapeFilter(categories=CATEGORY_FLOOR, mask=CATEGORY_ACROBAT),
+}
+
+# Broadphase of the pymunk space. None uses pymunk's bounding box tree.
+# (cell size, cell count) uses a spatial hash instead. The cell size should be
+# about the size of a balloon, the count about 10 times the number of shapes.
+SPATIAL_HASH = None
+
+# Moving balloon rows gain nothing from a spatial hash in their SpriteLists,
+# as the game never looks up balloons by position. It only costs updates.
+BALLOON_SPATIAL_HASH = False
+
+
+def get_balloons(level, use_spatial_hash=True):
+    """
+    Returns a list of SpriteLists with the rows of Balloons in a level.
+    """
+    rows_of_baloons = []
+
+    for row in level.balloon_rows:
+        # Add an empty row
+        rows_of_baloons.append(
+            arcade.SpriteList(use_spatial_hash=use_spatial_hash)
+        )
+        for x in row.xs:
+            b = Balloon(
+                center_x = x,
+                center_y = row.center_y,
+                size = row.size,
+                color = row.color,
+                )
+
+            # Add balloon to the current row
+            rows_of_baloons[-1].append(b)
+
+    return rows_of_baloons
+
+
+def get_walls(level):
+    """
+    Add walls that physics objects will bounce off of
+    """
+    walls = arcade.SpriteList()
+
+    for w in level.walls:
+        wall = Wall(w.center_x, w.center_y, w.width, w.height, w.color)
+        wall.set_hit_box(w.vertices)
+        walls.append(wall)
+
+    return walls
+
+
+def get_seesaw_speed(left, right, move, speed):
+    """
+    Return how far the seesaw moves in a tick with the given inputs.
+    Keys win over analog movement, and both keys cancel out.
+    """
+    if left and not right:
+        return -speed
+    if right and not left:
+        return speed
+    if not (left or right):
+        return move * speed
+    return 0
+
+
+def preload_textures():
+    """
+    Build the textures of every sprite in the game, so
+    no textures are created while the game is running.
+    """
+    prepare_textures(level_loader.get(FIRST_LEVEL))
+    Acrobat(0, 0)
+    Player(min_x_pos=0, max_x_pos=SCREEN_WIDTH)
+
+
+class BalloonRow:
+    """
+    A row of balloons moving together on one kinematic body.
+
+    Every balloon is a shape on the row's body, so pymunk moves the whole
+    row at once. Wrapping is done by moving the leading balloon's shape
+    one period back, so only one balloon per row is checked each tick.
+
+    A row far from every acrobat can sleep: its body and shapes leave the
+    space, and when it wakes up the body is moved to where it would have
+    been, as rows move at a constant speed.
+    """
+
+    def __init__(self, space, balloons, speed, min_x, max_x, vertices, collision_type, shape_filter=SHAPE_FILTERS["balloon"]):
+        """
+        Add the balloons in the SpriteList balloons to the space as one row.
+        vertices is the hit box of a balloon relative to its center.
+        """
+        self.space = space
+        self.balloons = balloons
+        self.vertices = vertices
+        self.min_x = min_x
+        self.max_x = max_x
+
+        # The distance a balloon moves when it wraps
+        self.period = max_x - min_x
+
+        self.body = pymunk.Body(body_type=pymunk.Body.KINEMATIC)
+        self.body.velocity = (speed, 0)
+        self.space.add(self.body)
+
+        # Balloons hidden because they are off screen
+        self.hidden = set()
+
+        # Height of the row, and the time it went to sleep or None if awake
+        self.center_y = balloons[0].center_y if len(balloons) else 0
+        self.asleep_since = None
+
+        # Position of each balloon relative to the body
+        self.offsets = {}
+        # The physics shape of each balloon
+        self.shapes = {}
+
+        for b in balloons:
+            shape = pymunk.Poly(self.body, self.get_vertices(b, b.center_x, b.center_y))
+            shape.collision_type = collision_type
+            shape.filter = shape_filter
+            shape.elasticity = 1.0
+            shape.friction = 0.2
+            self.space.add(shape)
+            self.offsets[b] = (b.center_x, b.center_y)
+            self.shapes[b] = shape
+
+        # Balloons from left to right
+        self.order = deque(sorted(balloons, key=lambda b: b.center_x))
+
+        # Column of each balloon, and 1 for every column with a balloon left
+        self.columns = {b: i for i, b in enumerate(balloons)}
+        self.alive = bytearray(b"\x01" * len(balloons))
+
+        # Every balloon and shape by column, popped or not, so a snapshot can bring them back
+        self.column_balloons = list(balloons)
+        self.column_shapes = [self.shapes[b] for b in balloons]
+
+    def get_vertices(self, balloon, x, y):
+        """
+        Return the balloon's hit box moved to (x, y)
+        """
+        return [(px + x, py + y) for px, py in self.vertices]
+
+    def __len__(self):
+        return len(self.order)
+
+    def get_position(self, balloon):
+        """
+        Return the position of a balloon in the world
+        """
+        offset_x, offset_y = self.offsets[balloon]
+        return (self.body.position.x + offset_x, offset_y)
+
+    def move_balloon(self, balloon, offset_x):
+        """
+        Move a balloon to a new place on the body
+        """
+        offset_y = self.offsets[balloon][1]
+        self.offsets[balloon] = (offset_x, offset_y)
+        self.shapes[balloon].unsafe_set_vertices(
+            self.get_vertices(balloon, offset_x, offset_y)
+        )
+
+    def wrap(self):
+        """
+        Move balloons that have left the screen to the other side
+        """
+        x = self.body.position.x
+        if self.body.velocity.x < 0:
+            # The leftmost balloon is the next to leave the screen
+            while self.order and x + self.offsets[self.order[0]][0] < self.min_x:
+                b = self.order.popleft()
+                self.move_balloon(b, self.offsets[b][0] + self.period)
+                self.order.append(b)
+        else:
+            # The rightmost balloon is the next to leave the screen
+            while self.order and x + self.offsets[self.order[-1]][0] > self.max_x:
+                b = self.order.pop()
+                self.move_balloon(b, self.offsets[b][0] - self.period)
+                self.order.appendleft(b)
+
+    def remove(self, balloon):
+        """
+        Remove a popped balloon from the row
+        """
+        # Leave the sprite where it was popped, to fade out
+        balloon.position = self.get_position(balloon)
+        if balloon in self.hidden:
+            self.hidden.discard(balloon)
+            balloon.visible = True
+        self.balloons.remove(balloon)
+
+        self.space.remove(self.shapes.pop(balloon))
+        del self.offsets[balloon]
+        self.order.remove(balloon)
+        self.alive[self.columns[balloon]] = 0
+
+    def sleep(self, now):
+        """
+        Take the row out of the space. now is the game time in seconds.
+        """
+        self.space.remove(self.body, *self.shapes.values())
+        self.asleep_since = now
+
+    def wake(self, now):
+        """
+        Put the row back into the space where it would be at game time now
+        """
+        # The row repeats every period, so only the remainder matters
+        distance = self.body.velocity.x * (now - self.asleep_since)
+        self.body.position += (math.fmod(distance, self.period), 0)
+        self.asleep_since = None
+
+        self.space.add(self.body, *self.shapes.values())
+        self.wrap()
+
+    def get_state(self):
+        """
+        Return the body x, sleep time (NaN if awake), alive mask and
+        x offset of every column, for a snapshot
+        """
+        offsets = [
+            self.offsets[b][0] if alive else 0.0
+            for b, alive in zip(self.column_balloons, self.alive)
+        ]
+        asleep_since = math.nan if self.asleep_since is None else self.asleep_since
+        return self.body.position.x, asleep_since, bytes(self.alive), offsets
+
+    def set_state(self, body_x, asleep_since, alive, offsets):
+        """
+        Put the row back to a state from get_state(). Popped balloons are
+        brought back and balloons popped since are removed without fading.
+        """
+        awake_now = self.asleep_since is None
+        awake_then = math.isnan(asleep_since)
+
+        # Shapes only go in and out of the space one by one if the row stays awake
+        in_space = awake_now and awake_then
+        if awake_now and not awake_then:
+            self.space.remove(self.body, *self.shapes.values())
+
+        for column, (b, was_alive, is_alive) in enumerate(zip(self.column_balloons, alive, self.alive)):
+            if was_alive and not is_alive:
+                shape = self.column_shapes[column]
+                self.shapes[b] = shape
+                self.offsets[b] = (offsets[column], self.center_y)
+                shape.unsafe_set_vertices(self.get_vertices(b, offsets[column], self.center_y))
+                if in_space:
+                    self.space.add(shape)
+                b.alpha = 255
+                self.hidden.discard(b)
+                self.balloons.append(b)
+            elif is_alive and not was_alive:
+                shape = self.shapes.pop(b)
+                del self.offsets[b]
+                if in_space:
+                    self.space.remove(shape)
+                self.hidden.discard(b)
+                b.remove_from_sprite_lists()
+            elif was_alive and self.offsets[b][0] != offsets[column]:
+                self.move_balloon(b, offsets[column])
+
+        self.alive[:] = alive
+        self.order = deque(sorted(self.offsets, key=lambda b: self.offsets[b][0]))
+        self.body.position = (body_x, self.body.position.y)
+
+        if awake_then and not awake_now:
+            self.space.add(self.body, *self.shapes.values())
+        self.asleep_since = None if awake_then else asleep_since
+
+    def destroy(self):
+        """
+        Remove the row and its balloons from the space
+        """
+        if self.asleep_since is None:
+            self.space.remove(self.body, *self.shapes.values())
+        for b in list(self.balloons):
+            b.kill()
+        self.shapes.clear()
+        self.offsets.clear()
+        self.order.clear()
+
+    def sync_sprites(self, x=None, x_range=None):
+        """
+        Move the balloon sprites to their physics positions. Only needed for drawing.
+        Pass x to place the row's body somewhere else, such as between two ticks.
+        Balloons outside x_range, (left, right), are hidden and not moved.
+        """
+        if x is None:
+            x = self.body.position.x
+
+        if x_range is None:
+            for b, (offset_x, offset_y) in self.offsets.items():
+                b.center_x = x + offset_x
+            for b in self.hidden:
+                b.visible = True
+            self.hidden.clear()
+            return
+
+        left, right = x_range
+        hidden = self.hidden
+        for b, (offset_x, offset_y) in self.offsets.items():
+            balloon_x = x + offset_x
+            if left <= balloon_x <= right:
+                if b in hidden:
+                    b.visible = True
+                    hidden.discard(b)
+                b.center_x = balloon_x
+            elif b not in hidden:
+                b.visible = False
+                hidden.add(b)
+
+
+class Simulation:
+    """
+    The game itself, without any drawing
+    """
+
+    def __init__(
+        self,
+        seed=None,
+        level=None,
+        balloon_rows=BALLOON_ROWS,
+        balloon_cols=BALLOON_COLS,
+        balloon_speed=BALLOON_SPEED,
+        player_speed_x=PLAYER_SPEED_X,
+        gravity=ACROBAT_GRAVITY,
+        tick_rate=TICK_RATE,
+        substeps=SUBSTEPS,
+        profiler=None,
+        spatial_hash=SPATIAL_HASH,
+        balloon_spatial_hash=BALLOON_SPATIAL_HASH,
+        count_contacts=False,
+    ):
+        """
+        Set up a new game. Games with the same seed and inputs play out the same.
+        With a level number the game starts on that level from the levels
+        directory and moves on to the next level when all balloons are popped.
+        Without one it plays a single level of balloon_rows and balloon_cols.
+        Each step() is one tick of 1 / tick_rate seconds, made of substeps
+        physics steps. player_speed_x is in pixels per 1/60 s at any tick rate.
+        Pass a FrameProfiler to time the phases of step(). With count_contacts,
+        the number of contact pairs after each step is kept in contact_pairs.
+        """
+        # All randomness in the rules comes from here. A game
+        # without a seed gets a random one, so it can be replayed.
+        if seed is None:
+            seed = random.randrange(2**63)
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+        # The settings needed to set up the same game again
+        self.settings = {
+            "level": level,
+            "balloon_rows": balloon_rows,
+            "balloon_cols": balloon_cols,
+            "balloon_speed": balloon_speed,
+            "player_speed_x": player_speed_x,
+            "gravity": list(gravity),
+            "tick_rate": tick_rate,
+            "substeps": substeps,
+        }
+
+        # Times the phases of each step
+        self.profiler = profiler or NullProfiler()
+
+        # Sprites with work to do: popped balloons fading out
+        # and the passanger following a moving seesaw
+        self.scheduler = Scheduler()
+        self.scheduler.add_group("dying", Balloon.fade)
+        self.scheduler.add_group("seesaw", Player.follow)
+
+        self.tick_rate = tick_rate
+        self.substeps = substeps
+        self.tick_time = 1 / tick_rate
+
+        # Seesaw movement per tick
+        self.player_speed_x = player_speed_x * TICK_RATE / tick_rate
+        self.gravity = gravity
+
+        # Create a Player object
+        self.player_sprite: Player = Player(
+            center_x=PLAYER_START_X,
+            center_y=PLAYER_START_Y,
+            min_x_pos=0,
+            max_x_pos=SCREEN_WIDTH,
+            scale=SPRITE_SCALING,
+        )
+
+        # The acrobats in the game
+        self.acrobats = arcade.SpriteList()
+
+        # Walls that objects can  bounce off off
+        self.walls = arcade.SpriteList()
+
+        # Events from the collision handlers, applied after each step
+        self.event_queue = EventQueue()
+
+        # The events applied in the last step. The renderer
+        # turns these into particle effects.
+        self.events = []
+
+        self.physics_engine = arcade.PymunkPhysicsEngine(
+            gravity=(0,0),
+            damping=1.0
+        )
+
+        if spatial_hash is not None:
+            cell_size, cell_count = spatial_hash
+            self.physics_engine.space.use_spatial_hash(cell_size, cell_count)
+
+        self.count_contacts = count_contacts
+        self.contact_pairs = 0
+
+        # Balloon rows out of the physics space at the last tick
+        self.sleeping_rows = 0
+
+        self.add_player_sprite_to_engine()
+
+        # The seesaw keeps its body for the whole game. A flip
+        # only turns the body to one of these two angles.
+        self.seesaw_body = self.physics_engine.get_physics_object(self.player_sprite).body
+        self.seesaw_poses = {
+            True: math.radians(-1 * Player.TILT_ANGLE),
+            False: math.radians(Player.TILT_ANGLE),
+        }
+
+        # The level decides the size of the playfield
+        self.level_number = level
+        if level is None:
+            level_data = generate_level(balloon_rows, balloon_cols, balloon_speed)
+        else:
+            level_data = level_loader.get(level)
+
+        # Invisible ceiling and floor
+        self.width = self.height = None
+        self.ceiling = self.floor = None
+        self.set_bounds(level_data.width, level_data.height)
+
+        self.balloon_spatial_hash = balloon_spatial_hash
+        self.balloon_sprite_lists = []
+        self.balloon_rows = []
+        self.balloon_shapes = {}
+        self.no_of_ballons = 0
+
+        # Add walls and balloons
+        self.load_level(level_data)
+
+        # Balloons are not sprites in the physics engine, so
+        # the handler is added to the pymunk space directly
+        h = self.physics_engine.space.add_collision_handler(
+            self.get_collision_type("balloon"),
+            self.get_collision_type("acrobat"),
+            )
+        h.post_solve = self.c_balloon_acrobat
+
+        self.physics_engine.add_collision_handler(
+            first_type="acrobat",
+            second_type="floor",
+            post_handler=self.c_acrobat_floor
+            )
+
+        self.physics_engine.add_collision_handler(
+            first_type="acrobat",
+            second_type="seesaw",
+            post_handler=self.c_acrobat_seesaw,
+            )
+
+        # Dead acrobats are reused for new ones
+        self.acrobat_pool = AcrobatPool(
+            physics_engine=self.physics_engine,
+            acrobats=self.acrobats,
+            scale=SPRITE_SCALING,
+            gravity=self.gravity,
+            shape_filter=SHAPE_FILTERS["acrobat"],
+        )
+
+        # Set up the player info
+        self.player_score = 0
+        self.player_lives = PLAYER_LIVES
+
+        # Number of times step() has been called
+        self.ticks = 0
+
+        self.spawn_acrobat()
+
+    def set_bounds(self, width, height):
+        """
+        Put the ceiling and floor around a playfield of width and height
+        """
+        if (width, height) == (self.width, self.height):
+            return
+        self.width = width
+        self.height = height
+        self.player_sprite.max_x_pos = width
+
+        if self.ceiling is not None:
+            self.ceiling.kill()
+            self.floor.kill()
+
+        # Add an invisible ceiling
+        self.ceiling = Wall(width/2, height+5, width*2, 10)
+        self.physics_engine.add_sprite(
+            self.ceiling,
+            body_type=arcade.PymunkPhysicsEngine.STATIC,
+            collision_type="ceiling",
+            elasticity=1.0,
+        )
+        self.set_shape_filter(self.ceiling, "ceiling")
+
+        # Add an invisible floor
+        self.floor = Wall(width/2, -20/2, width*2, 20)
+        self.physics_engine.add_sprite(
+            self.floor,
+            body_type=arcade.PymunkPhysicsEngine.STATIC,
+            collision_type="floor"
+        )
+        self.set_shape_filter(self.floor, "floor")
+
+    def load_level(self, level):
+        """
+        Replace the walls and balloons with those of a compiled level
+        """
+        self.level = level
+        self.set_bounds(level.width, level.height)
+
+        # Remove the walls of the last level
+        for wall in list(self.walls):
+            wall.kill()
+
+        # Add walls
+        for wall in get_walls(level):
+            self.walls.append(wall)
+        self.physics_engine.add_sprite_list(
+            self.walls,
+            body_type=arcade.PymunkPhysicsEngine.STATIC,
+            collision_type="wall",
+            elasticity=1.0,
+            )
+        for wall in self.walls:
+            self.set_shape_filter(wall, "wall")
+
+        self.load_balloons(level)
+
+    def load_balloons(self, level):
+        """
+        Replace the balloons with a full set from a compiled level
+        """
+        for b in self.scheduler.clear("dying"):
+            b.kill()
+        for row in self.balloon_rows:
+            row.destroy()
+
+        # A list of SpriteLists containing rows of Balloons
+        self.balloon_sprite_lists = get_balloons(
+            level,
+            use_spatial_hash=self.balloon_spatial_hash,
+        )
+
+        # Each row of balloons is one body in the physics engine
+        self.balloon_rows = []
+        self.no_of_ballons = 0
+        for row_data, sprite_list in zip(level.balloon_rows, self.balloon_sprite_lists):
+            self.balloon_rows.append(
+                BalloonRow(
+                    space=self.physics_engine.space,
+                    balloons=sprite_list,
+                    speed=row_data.speed,
+                    min_x=row_data.min_x,
+                    max_x=row_data.max_x,
+                    vertices=row_data.vertices,
+                    collision_type=self.get_collision_type("balloon"),
+                )
+            )
+            self.no_of_ballons += len(sprite_list)
+
+        # Find the row of a balloon from its physics shape
+        self.balloon_shapes = {}
+        for row in self.balloon_rows:
+            for b, shape in row.shapes.items():
+                self.balloon_shapes[shape] = (b, row)
+
+        # Get the next level ready while this one is played
+        if self.level_number is not None:
+            level_loader.preload(self.level_number + 1)
+
+    def reset(self, seed=None):
+        """
+        Start a new game on the same physics engine. The seesaw, the walls,
+        the collision handlers and the acrobat pool are kept, and only the
+        balloons, acrobats, score and lives are set up again.
+
+        The rules and the start of the game are the same as in a new
+        Simulation, but pymunk keeps internal state from the last game, so
+        the game does not play out exactly like a new Simulation with the
+        same seed. Games that are replayed must start from a new Simulation.
+        """
+        if seed is None:
+            seed = random.randrange(2**63)
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+        # Acrobats go back to the pool
+        for a in list(self.acrobats):
+            self.acrobat_pool.release(a)
+        self.event_queue.drain()
+        self.events = []
+
+        # Back to the first level, reusing its walls if they are still in place
+        first_level = self.settings["level"]
+        if first_level != self.level_number:
+            self.level_number = first_level
+            self.load_level(level_loader.get(first_level))
+        else:
+            self.load_balloons(self.level)
+
+        # Seesaw back to the start with the left side down
+        if not self.player_sprite.left_side_down:
+            self.player_sprite.flip()
+        self.seesaw_body.angle = self.seesaw_poses[True]
+        self.player_sprite.position = (PLAYER_START_X, PLAYER_START_Y)
+        self.physics_engine.set_position(self.player_sprite, self.player_sprite.position)
+        self.scheduler.add("seesaw", self.player_sprite)
+
+        self.player_score = 0
+        self.player_lives = PLAYER_LIVES
+        self.ticks = 0
+        self.contact_pairs = 0
+
+        self.spawn_acrobat()
+
+    def next_level(self):
+        """
+        Move on to the next level, if there is one. Returns True if the level changed.
+        """
+        if self.level_number is None or not has_level(self.level_number + 1):
+            return False
+
+        self.level_number += 1
+        self.load_level(level_loader.get(self.level_number))
+        self.events.append(LevelLoaded(self.level_number))
+        log.info("level", "Level %d", self.level_number)
+        return True
+
+    def set_shape_filter(self, sprite, kind):
+        """
+        Set the collision category and mask of a sprite's shape
+        """
+        self.physics_engine.get_physics_object(sprite).shape.filter = SHAPE_FILTERS[kind]
+
+    def get_contact_pairs(self):
+        """
+        Return the number of shape pairs touching each other. Every pair
+        the game lets collide has an acrobat, so only acrobats are checked.
+        """
+        pairs = set()
+
+        def add_pair(arbiter):
+            a, b = arbiter.shapes
+            pairs.add((id(a), id(b)) if id(a) < id(b) else (id(b), id(a)))
+
+        for a in self.acrobats:
+            self.physics_engine.get_physics_object(a).body.each_arbiter(add_pair)
+
+        return len(pairs)
+
+    def get_collision_type(self, name):
+        """
+        Return the pymunk collision type for a collision type name
+        """
+        if name not in self.physics_engine.collision_types:
+            self.physics_engine.collision_types.append(name)
+        return self.physics_engine.collision_types.index(name)
+
+    def c_balloon_acrobat(self, arbiter, space, _data):
+
+        if arbiter.is_first_contact:
+            shape_balloon = arbiter.shapes[0]
+
+            # The balloon may already be popped by an earlier step
+            if shape_balloon not in self.balloon_shapes:
+                return
+            sprite_balloon, row = self.balloon_shapes[shape_balloon]
+
+            self.event_queue.push(
+                BalloonPopped(sprite_balloon, row, row.get_position(sprite_balloon)),
+                sprite_balloon,
+            )
+
+    def c_acrobat_floor(self, sprite_acrobat, sprite_floor, arbiter, space, _data):
+        self.event_queue.push(
+            LifeLost(sprite_acrobat, sprite_acrobat.position),
+            sprite_acrobat,
+        )
+
+    def c_acrobat_seesaw(self, sprite_acrobat, sprite_seesaw, arbiter, space, _data):
+        # Horizontal distance between sprites
+        diff_x = sprite_acrobat.center_x - sprite_seesaw.center_x
+
+        # Acrobat hits side of seesaw which is down (bad)
+        if diff_x > 0 and sprite_seesaw.left_side_down:
+            event = LifeLost(sprite_acrobat, sprite_acrobat.position)
+        else:
+            event = AcrobatLanded(
+                sprite_acrobat, diff_x, sprite_seesaw.position, sprite_seesaw.width
+            )
+
+        self.event_queue.push(event, sprite_acrobat)
+
+    def apply_events(self):
+        """
+        Apply the events queued by the collision handlers during the last step
+        """
+        self.events = self.event_queue.drain()
+
+        for event in self.events:
+            if isinstance(event, BalloonPopped):
+                # Remove the balloon
+                del self.balloon_shapes[event.row.shapes[event.balloon]]
+                event.row.remove(event.balloon)
+                event.balloon.start_death_sequence()
+                self.scheduler.add("dying", event.balloon)
+                self.no_of_ballons -= 1
+                self.player_score += 10
+
+                log.debug("balloon", "No of Balloons in game: %d", self.no_of_ballons)
+
+            elif isinstance(event, LifeLost):
+                # Acrobat dies
+                self.acrobat_pool.release(event.acrobat)
+                # Player looses a life
+                self.player_lives -= 1
+                self.spawn_acrobat()
+
+            elif isinstance(event, AcrobatLanded):
+                self.bounce_acrobat(event)
+
+    def bounce_acrobat(self, event):
+        """
+        Launch a new acrobat from the seesaw
+        """
+        diff_x = event.diff_x
+        seesaw_x, seesaw_y = event.seesaw_position
+
+        # Acrobat hits center = 0.0, sides = 1.0
+        a_speed_modifier = diff_x/(event.seesaw_width/2)
+
+        # Scale up speed modifier
+        a_speed_modifier *= 2.0
+
+        log.debug("seesaw", "Speed modifier %.2f", a_speed_modifier)
+
+        self.acrobat_pool.release(event.acrobat)
+        self.flip_player()
+        # Calculate new acrobat's speeds
+        a_x_speed = abs(a_speed_modifier) * 50
+        if diff_x < 0:
+            a_x_speed *= -1
+        a_y_speed = abs(a_speed_modifier) * 400
+
+        self.spawn_acrobat(
+            position=(
+                seesaw_x + -1 * diff_x,
+                seesaw_y + 60),
+            velocity=(a_x_speed, a_y_speed),
+            angular_velocity= -1 * a_speed_modifier
+            )
+
+    def add_player_sprite_to_engine(self):
+        self.physics_engine.add_sprite(
+            self.player_sprite,
+            body_type=arcade.PymunkPhysicsEngine.KINEMATIC,
+            collision_type="seesaw",
+            gravity=(0,0),
+            elasticity=1.0,
+        )
+        self.set_shape_filter(self.player_sprite, "seesaw")
+
+    def flip_player(self):
+        """
+        Tilt the seesaw to the other side by turning its body in place
+        """
+        self.player_sprite.flip()
+        self.seesaw_body.angle = self.seesaw_poses[self.player_sprite.left_side_down]
+
+        # Passanger moves to the raised side
+        self.scheduler.add("seesaw", self.player_sprite)
+
+    def spawn_acrobat(self, position=None,velocity=None,angular_velocity=0.0):
+
+        # Spawn on platforms by default
+        if position is None and velocity is None:
+            # Position and velocity to use when
+            # launching from platforms
+            p_x, p_y, v_x, v_y = self.rng.choice(self.level.spawn_points)
+        else:
+            p_x, p_y = position
+            v_x, v_y = velocity
+
+        # Take an acrobat from the pool
+        return self.acrobat_pool.acquire(
+            position=(p_x, p_y),
+            velocity=(v_x, v_y),
+            angular_velocity=angular_velocity,
+        )
+
+    def update_sleeping(self):
+        """
+        Put balloon rows far from every acrobat to sleep and wake those an acrobat came near
+        """
+        now = self.ticks * self.tick_time
+        heights = [a.center_y for a in self.acrobats]
+        self.sleeping_rows = 0
+        for row in self.balloon_rows:
+            near = any(abs(y - row.center_y) < SLEEP_DISTANCE for y in heights)
+            if row.asleep_since is None:
+                if not near and heights:
+                    row.sleep(now)
+                    self.sleeping_rows += 1
+            elif near:
+                row.wake(now)
+            else:
+                self.sleeping_rows += 1
+
+    @property
+    def is_over(self):
+        """
+        True when there are no balloons or no lives left
+        """
+        return self.no_of_ballons <= 0 or self.player_lives <= 0
+
+    def step(self, left=False, right=False, flip=False, move=0.0):
+        """
+        Move the game one tick forward with the given inputs. move is
+        analog movement from -1 to 1, used when left and right are not.
+        """
+        self.ticks += 1
+        profiler = self.profiler
+        t = profiler.now()
+
+        if flip:
+            self.flip_player()
+
+        # Acrobats reflect on left & right.
+        for a in self.acrobats:
+            # Get the physics object for the sprite
+            physics_object = self.physics_engine.get_physics_object(a)
+            # Get the current sprite velocity
+            velocity_x, velocity_y = physics_object.body.velocity
+            # Bounce x
+            if a.center_x > self.width or a.center_x < 0:
+                self.physics_engine.set_velocity(a, (velocity_x * -1, velocity_y))
+        t = profiler.lap("acrobat_bounce", t)
+
+        # Only rows near an acrobat are simulated
+        self.update_sleeping()
+        t = profiler.lap("sleep", t)
+
+        # Calculate player speed
+        player_speed_x = get_seesaw_speed(left, right, move, self.player_speed_x)
+
+        # Reposition the player sprite via the physics engine,
+        # and move the passanger with it after the step
+        if player_speed_x:
+            self.physics_engine.set_position(
+                self.player_sprite,
+                (self.player_sprite.center_x + player_speed_x, self.player_sprite.center_y)
+            )
+            self.scheduler.add("seesaw", self.player_sprite)
+        t = profiler.lap("player", t)
+
+        # Update all sprites via the Physics engine. The
+        # sprites only need to follow after the last sub-step.
+        delta_time = self.tick_time / self.substeps
+        for i in range(self.substeps):
+            self.physics_engine.step(
+                delta_time=delta_time,
+                resync_sprites=i == self.substeps - 1,
+            )
+        t = profiler.lap("physics", t)
+
+        if self.count_contacts:
+            self.contact_pairs = self.get_contact_pairs()
+
+        # Pop balloons, kill and launch acrobats
+        self.apply_events()
+
+        # All balloons popped
+        if self.no_of_ballons <= 0:
+            self.next_level()
+        t = profiler.lap("events", t)
+
+        # Wrap balloons when off screen
+        for row in self.balloon_rows:
+            row.wrap()
+        t = profiler.lap("balloon_wrap", t)
+
+        # Tick only the sprites with work to do
+        self.scheduler.tick()
+        profiler.lap("scheduler", t)
@@ -0,0 +1,279 @@
+"""
+Snapshots of the full game state, and a rewind buffer.
+
+capture() packs everything that changes during a game into bytes: the
+tick, score, lives and level, the state of the random number generator,
+the seesaw, every live acrobat's body and every balloon row's body,
+alive mask and balloon offsets. restore() puts a Simulation back into
+that state in place, reusing its bodies, shapes and sprites.
+
+A restored game follows the same rules, but pymunk keeps cached contacts
+that a snapshot does not hold, so it is not bit-identical to the game
+the snapshot was taken from. Replays that must match exactly start from
+a new Simulation.
+
+RewindBuffer keeps snapshots of the last ticks within a memory budget.
+Most snapshots are stored as the XOR with the one before, compressed,
+which is mostly zeros, and every KEYFRAME_INTERVAL snapshots one is
+stored whole. The buffer always keeps the newest keyframe and the one
+before it with the snapshots that follow them, even over budget, so a
+small budget still leaves at least one keyframe interval to rewind.
+"""
+
+import math
+import struct
+import zlib
+from array import array
+from collections import deque
+
+from my_simulation import PLAYER_START_Y
+from my_levels import level_loader
+
+# ticks, score, lives, balloons, level (-1 for none), left side down, seesaw x,
+# rng gauss flag, rng gauss value, rows, acrobats
+# Lives are a double, as the benchmark plays with infinite lives
+HEADER = struct.Struct("<IidiiBd?dII")
+RNG_STATE_LENGTH = 625
+ROW = struct.Struct("<ddI")  # body x, asleep since, columns
+ACROBAT = struct.Struct("<6d")  # x, y, velocity x, velocity y, angle, angular velocity
+
+# Memory the rewind buffer may use, in bytes
+REWIND_BUDGET = 4 * 1024 * 1024
+
+# A whole snapshot is kept every this many snapshots
+KEYFRAME_INTERVAL = 60
+
+
+def capture(sim):
+    """
+    Return the state of a Simulation as bytes
+    """
+    version, rng_state, gauss = sim.rng.getstate()
+    player = sim.player_sprite
+
+    parts = [
+        HEADER.pack(
+            sim.ticks,
+            int(sim.player_score),
+            sim.player_lives,
+            sim.no_of_ballons,
+            -1 if sim.level_number is None else sim.level_number,
+            player.left_side_down,
+            sim.seesaw_body.position.x,
+            gauss is not None,
+            gauss or 0.0,
+            len(sim.balloon_rows),
+            len(sim.acrobats),
+        ),
+        array("I", rng_state).tobytes(),
+    ]
+
+    for row in sim.balloon_rows:
+        body_x, asleep_since, alive, offsets = row.get_state()
+        parts.append(ROW.pack(body_x, asleep_since, len(alive)))
+        parts.append(alive)
+        parts.append(array("d", offsets).tobytes())
+
+    for a in sim.acrobats:
+        body = sim.physics_engine.get_physics_object(a).body
+        parts.append(ACROBAT.pack(
+            *body.position, *body.velocity, body.angle, body.angular_velocity,
+        ))
+
+    return b"".join(parts)
+
+
+def restore(sim, data):
+    """
+    Put a Simulation back into the state of a snapshot from capture()
+    """
+    (
+        ticks, score, lives, balloons, level_number, left_side_down,
+        seesaw_x, has_gauss, gauss, row_count, acrobat_count,
+    ) = HEADER.unpack_from(data)
+    offset = HEADER.size
+
+    rng_state = array("I")
+    rng_state.frombytes(data[offset:offset + RNG_STATE_LENGTH * 4])
+    offset += RNG_STATE_LENGTH * 4
+    sim.rng.setstate((3, tuple(rng_state), gauss if has_gauss else None))
+
+    # Back to the level of the snapshot
+    level_number = None if level_number < 0 else level_number
+    if level_number != sim.level_number:
+        sim.level_number = level_number
+        sim.load_level(level_loader.get(level_number))
+
+    # Fading balloons either come back or stay popped
+    for b in sim.scheduler.clear("dying"):
+        b.kill()
+
+    for row in sim.balloon_rows:
+        body_x, asleep_since, columns = ROW.unpack_from(data, offset)
+        offset += ROW.size
+        alive = data[offset:offset + columns]
+        offset += columns
+        offsets = array("d")
+        offsets.frombytes(data[offset:offset + columns * 8])
+        offset += columns * 8
+        row.set_state(body_x, asleep_since, alive, offsets)
+
+    sim.balloon_shapes = {
+        shape: (b, row)
+        for row in sim.balloon_rows
+        for b, shape in row.shapes.items()
+    }
+
+    # Acrobats are taken from the pool again with their old bodies' state
+    for a in list(sim.acrobats):
+        sim.acrobat_pool.release(a)
+    for _ in range(acrobat_count):
+        x, y, velocity_x, velocity_y, angle, angular_velocity = ACROBAT.unpack_from(data, offset)
+        offset += ACROBAT.size
+        a = sim.spawn_acrobat((x, y), (velocity_x, velocity_y), angular_velocity)
+        body = sim.physics_engine.get_physics_object(a).body
+        body.angle = angle
+        a.angle = math.degrees(angle)
+
+    # Seesaw
+    player = sim.player_sprite
+    if player.left_side_down != bool(left_side_down):
+        player.flip()
+    sim.seesaw_body.angle = sim.seesaw_poses[player.left_side_down]
+    player.position = (seesaw_x, PLAYER_START_Y)
+    sim.physics_engine.set_position(player, player.position)
+    player.follow()
+
+    sim.ticks = ticks
+    sim.player_score = score
+    sim.player_lives = lives if math.isinf(lives) else int(lives)
+    sim.no_of_ballons = balloons
+    sim.event_queue.drain()
+    sim.events = []
+
+
+def xor_bytes(a, b):
+    """
+    Return the XOR of two byte strings of the same length
+    """
+    n = len(a)
+    return (int.from_bytes(a, "little") ^ int.from_bytes(b, "little")).to_bytes(n, "little")
+
+
+class RewindBuffer:
+    """
+    Snapshots of the last ticks, delta encoded, within a fixed memory budget
+    """
+
+    def __init__(self, budget=REWIND_BUDGET, keyframe_interval=KEYFRAME_INTERVAL):
+        self.budget = budget
+        self.keyframe_interval = keyframe_interval
+
+        # (tick, is keyframe, compressed data), oldest first
+        self.entries = deque()
+
+        # Bytes used by the entries, and the number of keyframes among them
+        self.size = 0
+        self.keyframes = 0
+
+        # The last snapshot pushed, to encode the next one against
+        self.last = None
+        self.since_keyframe = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+        self.keyframes = 0
+        self.last = None
+        self.since_keyframe = 0
+
+    @property
+    def ticks(self):
+        """
+        The ticks that can be rewound to, oldest first
+        """
+        return [tick for tick, _, _ in self.entries]
+
+    def push(self, sim):
+        """
+        Add a snapshot of the Simulation's current state
+        """
+        data = capture(sim)
+
+        # Snapshots change length when acrobats or rows come and go
+        keyframe = (
+            self.last is None
+            or len(data) != len(self.last)
+            or self.since_keyframe >= self.keyframe_interval
+        )
+        if keyframe:
+            stored = zlib.compress(data, 1)
+            self.since_keyframe = 0
+        else:
+            stored = zlib.compress(xor_bytes(data, self.last), 1)
+            self.since_keyframe += 1
+
+        self.entries.append((sim.ticks, keyframe, stored))
+        self.size += len(stored)
+        self.keyframes += keyframe
+        self.last = data
+
+        # Drop the oldest keyframe and its deltas to stay in budget, so the
+        # oldest kept snapshot is a keyframe and can be decoded. The last
+        # two keyframes stay, or every new keyframe would empty the buffer.
+        while self.size > self.budget and self.keyframes > 2:
+            self.drop_oldest()
+            while not self.entries[0][1]:
+                self.drop_oldest()
+
+    def drop_oldest(self):
+        _, keyframe, stored = self.entries.popleft()
+        self.size -= len(stored)
+        self.keyframes -= keyframe
+        if not self.entries:
+            self.last = None
+
+    def get(self, tick):
+        """
+        Return the index and the decoded snapshot of the newest tick at or before tick
+        """
+        index = None
+        for i, (entry_tick, _, _) in enumerate(self.entries):
+            if entry_tick > tick:
+                break
+            index = i
+        if index is None:
+            raise ValueError(f"Tick {tick} is not in the rewind buffer")
+
+        # Decode from the keyframe before it
+        start = index
+        while not self.entries[start][1]:
+            start -= 1
+        data = zlib.decompress(self.entries[start][2])
+        for i in range(start + 1, index + 1):
+            data = xor_bytes(data, zlib.decompress(self.entries[i][2]))
+        return index, data
+
+    def rewind(self, sim, tick):
+        """
+        Restore the newest snapshot at or before tick and forget the ones after it.
+        Returns the tick the Simulation is at now.
+        """
+        index, data = self.get(tick)
+        restore(sim, data)
+
+        while len(self.entries) > index + 1:
+            _, keyframe, stored = self.entries.pop()
+            self.size -= len(stored)
+            self.keyframes -= keyframe
+        self.last = data
+        self.since_keyframe = 0
+        for i in range(index, -1, -1):
+            if self.entries[i][1]:
+                break
+            self.since_keyframe += 1
+
+        return sim.ticks
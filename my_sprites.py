@@ -1,16 +1,14 @@
 import arcade
 
+# Textures are shared by all sprites of the same kind, size and color
+from my_textures import texture_registry
+
 class Acrobat(arcade.Sprite):
     """
     A flying acrobat
     """
     def __init__(self, center_x, center_y, color=arcade.color.RED, scale=1):
-        # Create a texture if none is supplied
-        texture = arcade.Texture.create_filled(
-            "acrobat",
-            (50,50),
-            color=color,
-        )
+        texture = texture_registry.get("acrobat", (50,50), color)
 
         # Pass arguments to class arcade.Sprite
         super().__init__(
@@ -26,11 +24,7 @@ class Wall(arcade.Sprite):
     """
     def __init__(self, center_x, center_y, width, height, colour=arcade.color.PERSIAN_INDIGO):
 
-        texture = arcade.Texture.create_filled(
-            "wall",
-            (width,height),
-            colour
-        )
+        texture = texture_registry.get("wall", (width,height), colour)
 
         # Pass arguments to class arcade.Sprite
         super().__init__(
@@ -43,12 +37,8 @@ class Balloon(arcade.Sprite):
     """
     The Balloon
     """
-    def __init__(self,center_x,center_y,min_x=0,max_x=1024,size=30,color=arcade.color.PINK):
-        texture = arcade.Texture.create_filled(
-            f"balloon_{color}",
-            (30,30),
-            color,
-        )
+    def __init__(self,center_x,center_y,size=30,color=arcade.color.PINK):
+        texture = texture_registry.get("balloon", (size,size), color)
 
         # Pass arguments to class arcade.Sprite
         super().__init__(
@@ -57,48 +47,41 @@ class Balloon(arcade.Sprite):
             texture = texture
         )
 
-        self.min_x = min_x
-        self.max_x = max_x
-
-    def get_wrap_pos(self):
-        """
-        Return new position if Baloon is in a wrap position.
-        Otherwise, return None.
-        The physics engine will call this function to potentially move the sprite.
-        """
-        if self.center_x < self.min_x:
-            return (self.max_x, self.center_y)
-        elif self.center_x > self.max_x:
-            # self.center_x = self.min_x
-            return (self.min_x, self.center_y)
-
-        return None
-
     def start_death_sequence(self):
 
         self.alpha -= 1
 
     def update(self):
         if self.alpha < 255:
-            self.alpha *= 0.91
-            if self.alpha < 1:
-                self.kill()
+            self.fade()
+
+    def fade(self):
+        """
+        Fade a popped balloon out a step. Returns False once it is gone.
+        """
+        self.alpha *= 0.91
+        if self.alpha < 1:
+            self.kill()
+            return False
+        return True
 
 class Player(arcade.Sprite):
     """
     The player
     """
 
+    # The seesaw is tilted this many degrees to one side or the other
+    TILT_ANGLE = 20
+
     def __init__(self, min_x_pos, max_x_pos, center_x=0, center_y=0, scale=1):
         """
         Setup new Player object
         """
-        t = arcade.Texture.create_filled("seesaw", [400, 40], arcade.color.JAZZBERRY_JAM)
+        t = texture_registry.get("seesaw", (400, 40), arcade.color.JAZZBERRY_JAM)
 
         # Limits on player's x position
         self.min_x_pos = min_x_pos
         self.max_x_pos = max_x_pos
-        self.lives = 3
 
         # Pass arguments to class arcade.Sprite
         super().__init__(
@@ -106,7 +89,7 @@ class Player(arcade.Sprite):
             center_y=center_y,
             texture=t,
             scale=scale,
-            angle=-20
+            angle=-1 * self.TILT_ANGLE
         )
 
         # The (Fake) Acrobat waiting to be launched
@@ -123,7 +106,12 @@ class Player(arcade.Sprite):
         """
         Move the sprite
         """
+        self.follow()
 
+    def follow(self):
+        """
+        Move the passanger to the raised side. Only needed when the seesaw moves.
+        """
         if self.left_side_down:
             self.passanger.center_x = self.center_x + self.width/2
         else:
@@ -0,0 +1,137 @@
+"""
+Startup timing.
+
+With the environment variable in STARTUP_TRACE_ENV set, my_game.py
+reports how long it took to start: the import time of every module,
+the time to create the window and its OpenGL context, and the time
+until the intro screen was first drawn.
+
+    MY_GAME_TRACE_STARTUP=1 python my_game.py
+
+Only the standard library is imported here, so my_game.py can import
+this module first and have all other imports timed.
+"""
+
+import os
+import sys
+import time
+
+# Set this environment variable to trace the startup
+STARTUP_TRACE_ENV = "MY_GAME_TRACE_STARTUP"
+
+# Modules shown in the report, slowest first
+STARTUP_TRACE_MODULES = 20
+
+
+class TimedLoader:
+    """
+    Wraps a module loader and times running the module
+    """
+
+    def __init__(self, loader, trace):
+        self.loader = loader
+        self.trace = trace
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        trace = self.trace
+
+        # Time spent importing other modules from this one
+        trace.stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            total = time.perf_counter() - start
+            children = trace.stack.pop()
+            if trace.stack:
+                trace.stack[-1] += total
+            trace.imports[module.__name__] = (total - children, total)
+
+
+class ImportTimer:
+    """
+    Finds modules with the other finders and times their loaders
+    """
+
+    def __init__(self, trace):
+        self.trace = trace
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = TimedLoader(spec.loader, self.trace)
+            return spec
+        return None
+
+
+class StartupTrace:
+    """
+    Import times and named points in time since the game started
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.enabled = False
+
+        # Own and total seconds of each module import
+        self.imports = {}
+        self.stack = []
+
+        # (name, seconds since start)
+        self.marks = []
+
+    def install(self):
+        """
+        Start timing imports
+        """
+        sys.meta_path.insert(0, ImportTimer(self))
+        self.enabled = True
+
+    def stop(self):
+        """
+        Stop timing imports and taking marks
+        """
+        sys.meta_path[:] = [f for f in sys.meta_path if not isinstance(f, ImportTimer)]
+        self.enabled = False
+
+    def mark(self, name):
+        """
+        Note that the startup reached a point
+        """
+        if self.enabled:
+            self.marks.append((name, time.perf_counter() - self.start))
+
+    def report(self, modules=STARTUP_TRACE_MODULES):
+        """
+        Return the lines of the startup report
+        """
+        lines = ["startup              since start ms  step ms"]
+        last = 0.0
+        for name, seconds in self.marks:
+            lines.append(f"{name:<20}{seconds * 1000:>15.1f}{(seconds - last) * 1000:>9.1f}")
+            last = seconds
+
+        total = sum(own for own, _ in self.imports.values())
+        lines.append(f"{len(self.imports)} modules imported in {total * 1000:.1f} ms")
+        lines.append("module                                    own ms  total ms")
+        slowest = sorted(self.imports.items(), key=lambda item: item[1][0], reverse=True)
+        for name, (own, module_total) in slowest[:modules]:
+            lines.append(f"{name:<40}{own * 1000:>8.1f}{module_total * 1000:>10.1f}")
+        return lines
+
+
+# The trace of this run, only timing if asked for
+startup_trace = StartupTrace()
+if os.environ.get(STARTUP_TRACE_ENV):
+    startup_trace.install()
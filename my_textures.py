@@ -0,0 +1,72 @@
+"""
+Shared textures for the filled-color sprites.
+
+Every texture is built once per (kind, size, color), together with its
+hit box, and handed to all sprites that need it. Sprites created during
+the game then never build textures, and the textures can be packed into
+the texture atlas once at startup. Levels are loaded on a background
+thread, so building a texture is guarded by a lock.
+"""
+
+import threading
+
+import arcade
+
+
+class TextureRegistry:
+    """
+    Textures filled with one color, keyed by (kind, size, color)
+    """
+
+    def __init__(self):
+        self.textures = {}
+        self.lock = threading.Lock()
+
+        # Textures already added to an atlas
+        self.packed = set()
+
+    def __len__(self):
+        return len(self.textures)
+
+    def get(self, kind, size, color):
+        """
+        Return the shared texture of a kind of sprite with a size and color
+        """
+        key = (kind, tuple(size), tuple(color))
+
+        texture = self.textures.get(key)
+        if texture is not None:
+            return texture
+
+        with self.lock:
+            texture = self.textures.get(key)
+            if texture is not None:
+                return texture
+
+            width, height = size
+            # The atlas tells textures apart by name, so the
+            # name must be unique for each kind, size and color
+            texture = arcade.Texture.create_filled(
+                f"{kind}_{width}x{height}_{'_'.join(str(c) for c in color)}",
+                (width, height),
+                color,
+            )
+            # Calculate the hit box now, so sprites can share it
+            texture.hit_box_points
+            self.textures[key] = texture
+
+            return texture
+
+    def pack(self, atlas):
+        """
+        Add all textures not yet packed to a texture atlas.
+        Needs a window, so call it at startup and not in headless runs.
+        """
+        for texture in list(self.textures.values()):
+            if texture.name not in self.packed:
+                atlas.add(texture)
+                self.packed.add(texture.name)
+
+
+# The registry used by all sprites in the game
+texture_registry = TextureRegistry()
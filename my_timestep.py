@@ -0,0 +1,121 @@
+"""
+Fixed-timestep game loop.
+
+The window calls on_update once per frame with however much time has
+passed. FixedTimestep adds that time up and tells the game how many
+ticks of the Simulation to run, so the game runs at the tick rate
+whatever the frame rate. The time left over is a fraction of a tick,
+and Interpolator draws the moving sprites that far between where they
+were before the last tick and where they are now.
+"""
+
+import math
+
+from my_simulation import TICK_RATE
+
+# Most ticks run in one frame. A slower machine drops the rest
+# of the time, so the game slows down instead of freezing.
+MAX_TICKS_PER_FRAME = 8
+
+# Sprites moving further than this in one tick were moved, not flying,
+# and are drawn where they are now
+TELEPORT_DISTANCE = 100
+
+
+class FixedTimestep:
+    """
+    Turns frame times into a number of fixed ticks
+    """
+
+    def __init__(self, tick_rate=TICK_RATE, max_ticks=MAX_TICKS_PER_FRAME):
+        self.tick_time = 1 / tick_rate
+        self.max_ticks = max_ticks
+
+        # Time not yet run as ticks
+        self.accumulator = 0.0
+
+        # Seconds dropped because a frame needed too many ticks
+        self.dropped = 0.0
+
+    def reset(self):
+        self.accumulator = 0.0
+
+    def advance(self, delta_time):
+        """
+        Add the time of a frame and return the number of ticks to run
+        """
+        self.accumulator += delta_time
+        ticks = int(self.accumulator / self.tick_time)
+
+        if ticks > self.max_ticks:
+            self.dropped += (ticks - self.max_ticks) * self.tick_time
+            ticks = self.max_ticks
+            self.accumulator %= self.tick_time
+        else:
+            self.accumulator -= ticks * self.tick_time
+
+        return ticks
+
+    @property
+    def alpha(self):
+        """
+        How far between the last tick and the next one the frame is, from 0 to 1
+        """
+        return min(self.accumulator / self.tick_time, 1.0)
+
+
+def lerp_angle(a, b, alpha):
+    """
+    Return an angle in degrees alpha of the way from a to b, turning the short way
+    """
+    diff = (b - a + 180) % 360 - 180
+    return a + diff * alpha
+
+
+class Interpolator:
+    """
+    Draws sprites between their positions before and after the last tick
+    """
+
+    def __init__(self):
+        # Position and angle of each sprite before the last tick
+        self.previous = {}
+
+        # Position and angle of each sprite moved by apply()
+        self.current = {}
+
+    def capture(self, sprites):
+        """
+        Remember where sprites are. Call before each tick.
+        """
+        self.previous = {s: (s.center_x, s.center_y, s.angle) for s in sprites}
+
+    def apply(self, sprites, alpha):
+        """
+        Move sprites alpha of the way from their previous positions. Call restore() after drawing.
+        """
+        previous = self.previous
+        current = self.current
+        for s in sprites:
+            before = previous.get(s)
+            if before is None:
+                continue
+
+            x0, y0, angle0 = before
+            x1, y1, angle1 = s.center_x, s.center_y, s.angle
+            if math.hypot(x1 - x0, y1 - y0) > TELEPORT_DISTANCE:
+                continue
+
+            current[s] = (x1, y1, angle1)
+            s.position = (x0 + (x1 - x0) * alpha, y0 + (y1 - y0) * alpha)
+            if angle1 != angle0:
+                s.angle = lerp_angle(angle0, angle1, alpha)
+
+    def restore(self):
+        """
+        Put the sprites moved by apply() back where the game has them
+        """
+        for s, (x, y, angle) in self.current.items():
+            s.position = (x, y)
+            s.angle = angle
+        self.current.clear()